@@ -6,31 +6,61 @@ backtrace_scoped.py — robust COBOL backtrace with scoped graph + PROC/JCL line
 - Works with either 'direct_sources' or 'source_fields'
 - Never leaves final_key empty (fallbacks to node or ancestor DD/ASSIGN)
 - Adds diagnostics to help verify what was read and chosen
+- Graph nodes are interned ints with CSR adjacency (lineagegraph.ScopedGraph);
+  DD/ASSIGN pseudo nodes are ids above the var range
+- Opens lineage.idx (written by cobolindexer.py) via mmap when it is current;
+  falls back to parsing variables.csv
+- IMPACT mode walks the other way ("what does this field / DD / DSN feed?") over the
+  reverse edges stored in the index, with depth / fan-out / size limits
 """
 
-import os, io, re, csv, glob
+import os, io, re, csv, gzip, json, time
+from array import array
 from collections import defaultdict
+from functools import lru_cache
 from heapq import heappush, heappop
 
+try:
+    import zstandard                # optional: OUT_COMPRESS = "zstd"
+except Exception:
+    zstandard = None
+
+import runreport, copybookcache
+from lineagegraph import build_scoped, open_index, index_is_fresh
+
 # ---------------- configuration ----------------
 BASE = os.getcwd()
 CPY_DIR   = os.path.join(BASE, "copybook")      # optional allow-list
 CSV_VARS  = os.path.join(BASE, "variables.csv") # produced by your COBOL indexer
+LINEAGE_INDEX = os.path.join(BASE, "lineage.idx") # binary index, same run as variables.csv
 CSV_PROCS = os.path.join(BASE, "procs_index.csv")
 CSV_JCL   = os.path.join(BASE, "jcl_index.csv")
 CSV_OUT   = os.path.join(BASE, "enhanced_backtrace.csv")
+CSV_BATCH_OUT = os.path.join(BASE, "enhanced_backtrace_best.csv")  # BATCH mode output
+CSV_IMPACT_OUT = os.path.join(BASE, "impact.csv")                  # IMPACT mode output
 
 INCLUDE_ONLY_COPYBOOK = False       # set True to restrict output to names found in copybooks
 PREFER_ASSIGN_OVER_DD = True        # when both exist, prefer ASSIGN as final key
 ALLOW_CROSS_SCOPE_IF_UNIQUE = False # keep “scope isolation” strict
 MAX_DEPTH = 2000
 MAX_PATHS_PER_VAR = 50
+NEIGHBOR_CACHE = 1 << 18            # nodes whose sorted neighbor list is kept between start vars
 QUERY = ""  # e.g., "ALS-BOOKING-DATE" to limit run
+OUT_COMPRESS = ""                   # "" | "gzip" | "zstd" (adds .gz / .zst to the output name)
+CHECKPOINT_EVERY = 2000             # start vars between checkpoints (0 = no checkpoint/resume)
+BATCH = False                       # True -> one shared traversal, best origin per start var
+BATCH_TARGETS = ""                  # file with one variable name per line ("" = all / copybook names)
+IMPACT = ""                         # forward mode: "NAME" | "DD:x" | "ASSIGN:x" | "DSN:x" -> CSV_IMPACT_OUT
+IMPACT_MAX_DEPTH = 50               # hops downstream from the start
+IMPACT_MAX_FANOUT = 5000            # successors followed per node (0 = all)
+IMPACT_LIMIT = 0                    # stop after this many reached nodes (0 = no limit)
+PROFILE = False                     # True -> per-phase timings/counters in REPORT_JSON
+REPORT_JSON = os.path.join(BASE, "backtrace6_report.json")
+
+PROF = runreport.NULL               # replaced by a RunReport in main() when PROFILE
 
 # ---------------- helpers ----------------
 IDENT = r"[A-Z0-9][A-Z0-9\-]*"
-RE_ITEM = re.compile(rf"^\s*(\d{{2}})\s+({IDENT})\b", re.I)
-RE_88   = re.compile(r"^\s*88\b", re.I)
 RE_TOK  = re.compile(r"[A-Z0-9$#@-]+", re.I)
 
 def norm(s): 
@@ -49,31 +79,12 @@ def read_text(p):
 def split_list(s):
     return [x for x in (s or "").split(";") if x and x.strip()]
 
-def is_pseudo(n):
-    return isinstance(n,str) and (n.startswith("DD:") or n.startswith("ASSIGN:"))
-
 def copybook_names(copy_dir):
-    allow=set()
-    for path in glob.glob(os.path.join(copy_dir,"**/*"), recursive=True):
-        if not os.path.isfile(path): continue
-        if not path.upper().endswith((".CPY",".CPB",".CBL",".COB",".TXT",".INC",".COPY",".CP")):
-            continue
-        for raw in read_text(path).splitlines():
-            if not raw.strip() or RE_88.match(raw): 
-                continue
-            m=RE_ITEM.match(raw)
-            if m:
-                nm=norm(m.group(2))
-                if nm!="FILLER":
-                    allow.add(nm)
-    return allow
-
-# ---------------- two-pass load from variables.csv ----------------
-def load_vars_scoped(csv_path):
-    # --- pass 1: read all rows; keep per-row fields clean ---
-    raw_rows = []
-    by_file_name = defaultdict(list)  # (origin_file, name) -> [row_ids]
+    return copybookcache.load(copy_dir).names()
 
+# ---------------- load: lineage.idx (fast) or variables.csv ----------------
+def iter_csv_rows(csv_path):
+    """variables.csv -> cleaned (name, origin_file, parent_name, dds, assigns, sources)."""
     with io.open(csv_path, newline="", encoding="utf-8") as f:
         rdr=csv.DictReader(f)
         lower={k.lower():k for k in rdr.fieldnames}
@@ -85,166 +96,234 @@ def load_vars_scoped(csv_path):
             name = norm(get(row,"variable"))
             if not name:
                 continue
-            origin_file = get(row,"origin_file","") or ""
-            parent_name = norm(get(row,"parent_record"))
-
-            from_dd = [tok_only(x) for x in split_list(get(row,"from_dd","")) if tok_only(x)]
-            assign  = [tok_only(x) for x in split_list(get(row,"assign_target","")) if tok_only(x)]
-
             ds_src = get(row,"direct_sources")
             if not ds_src:
                 ds_src = get(row,"source_fields")  # alternate header name
-            direct_sources = [tok_only(x) for x in split_list(ds_src) if tok_only(x)]
-
-            rr = {
-                "name": name,
-                "origin_file": origin_file,
-                "parent_name": parent_name,
-                "from_dd": from_dd,
-                "assign": assign,
-                "direct_sources": direct_sources
-            }
-            idx = len(raw_rows)
-            raw_rows.append(rr)
-            by_file_name[(origin_file, name)].append(idx)
-
-    # helper to find a parent row index by (file, parent_name)
-    def find_parent_idx(file, parent_name):
-        if not parent_name: 
-            return None
-        lst = by_file_name.get((file, parent_name))
-        return lst[0] if lst else None
-
-    # --- pass 2: compute root per row by walking parents in same origin_file ---
-    roots = [None]*len(raw_rows)
-    for i, rr in enumerate(raw_rows):
-        seen=set(); cur=i
-        while cur is not None and cur not in seen:
-            seen.add(cur)
-            parent_name = raw_rows[cur]["parent_name"]
-            if not parent_name:
-                break
-            nxt = find_parent_idx(raw_rows[cur]["origin_file"], parent_name)
-            cur = nxt
-        roots[i] = cur if cur is not None else i
-
-    # build scoped graph keyed by (root_idx, origin_file, name)
-    def node_id(root_idx, file, name): 
-        return ("VAR", root_idx, file, name)
-
-    nodes=set()
-    origin_for={}
-    parent_of={}
-    sources_of=defaultdict(set)
-    from_dd_of=defaultdict(set)
-    assign_of=defaultdict(set)
-    root_of_node={}
-    name_of_node={}
-    scoped_index={}
-
-    # create nodes
-    for i, rr in enumerate(raw_rows):
-        root_idx=roots[i]; file=rr["origin_file"]; name=rr["name"]
-        nid=node_id(root_idx,file,name)
-        nodes.add(nid)
-        origin_for[nid]=file
-        root_of_node[nid]=root_idx
-        name_of_node[nid]=name
-        scoped_index[(root_idx,file,name)]=nid
-
-    # parents (within scope)
-    for i, rr in enumerate(raw_rows):
-        root_idx=roots[i]; file=rr["origin_file"]
-        child=scoped_index[(root_idx,file,rr["name"])]
-        pidx = find_parent_idx(file, rr["parent_name"])
-        if pidx is not None and roots[pidx]==root_idx:
-            parent=scoped_index[(root_idx,file,raw_rows[pidx]["name"])]
-            parent_of[child]=parent
-
-    # direct sources (within scope only)
-    for i, rr in enumerate(raw_rows):
-        root_idx=roots[i]; file=rr["origin_file"]
-        frm=scoped_index[(root_idx,file,rr["name"])]
-        for s in rr["direct_sources"]:
-            cand = scoped_index.get((root_idx,file,s))
-            if cand:
-                sources_of[frm].add(cand)
-
-    # dd/assign per node
-    for i, rr in enumerate(raw_rows):
-        root_idx=roots[i]; file=rr["origin_file"]
-        nid=scoped_index[(root_idx,file,rr["name"])]
-        for dd in rr["from_dd"]: from_dd_of[nid].add(dd)
-        for at in rr["assign"]:   assign_of[nid].add(at)
-
-    # also return per-row raw for fallbacks / debugging
-    return {
-        "nodes": nodes,
-        "origin_for": origin_for,
-        "parent_of": parent_of,
-        "sources_of": sources_of,
-        "from_dd_of": from_dd_of,
-        "assign_of": assign_of,
-        "root_of_node": root_of_node,
-        "name_of_node": name_of_node,
-        "scoped_index": scoped_index
-    }
+            yield (
+                name,
+                get(row,"origin_file","") or "",
+                norm(get(row,"parent_record")),
+                [t for t in map(tok_only, split_list(get(row,"from_dd",""))) if t],
+                [t for t in map(tok_only, split_list(get(row,"assign_target",""))) if t],
+                [t for t in map(tok_only, split_list(ds_src)) if t],
+            )
+
+def load_vars_scoped(csv_path):
+    return build_scoped(iter_csv_rows(csv_path))
+
+def load_graph():
+    """Open lineage.idx when it is at least as new as variables.csv, else parse the CSV."""
+    t0 = time.perf_counter()
+    if index_is_fresh(LINEAGE_INDEX, CSV_VARS):
+        try:
+            G = open_index(LINEAGE_INDEX)
+            print(f"Loaded {G.n} nodes from {LINEAGE_INDEX} in {time.perf_counter()-t0:.2f}s")
+            return G
+        except ValueError as e:
+            print(f"ignoring {LINEAGE_INDEX}: {e}")
+    if not os.path.exists(CSV_VARS):
+        return None
+    G = load_vars_scoped(CSV_VARS)
+    print(f"Loaded {G.n} nodes from {CSV_VARS} in {time.perf_counter()-t0:.2f}s")
+    return G
 
 # ---------------- traversal ----------------
 def neighbors(G, node):
-    parent_of=G["parent_of"]
-    sources_of=G["sources_of"]
-    from_dd_of=G["from_dd_of"]
-    assign_of=G["assign_of"]
-
-    if is_pseudo(node):
-        if node.startswith("DD:"):
-            dd=node[3:]
-            hops=set()
-            for n,dds in from_dd_of.items():
-                if dd in dds:
-                    for at in assign_of.get(n,set()):
-                        if at: hops.add(f"ASSIGN:{at}")
-            return hops
+    if not G.is_var(node):
+        if G.is_dd(node):
+            # DD -> ASSIGNs found on any node carrying that DD (precomputed dd_assigns)
+            base = G.assign_node(0)
+            return {base + a for a in G.dd_assigns.row(node - G.n)}
         return set()
 
     hops=set()
-    p=parent_of.get(node)
-    if p: hops.add(p)
-    hops |= sources_of.get(node,set())
-    for dd in from_dd_of.get(node,set()):
-        hops.add(f"DD:{dd}")
-    for at in assign_of.get(node,set()):
-        hops.add(f"ASSIGN:{at}")
+    p=G.parent[node]
+    if p >= 0: hops.add(p)
+    hops.update(G.sources.row(node))
+    hops.update(G.dd_node(d) for d in G.from_dd.row(node))
+    hops.update(G.assign_node(a) for a in G.assign.row(node))
     return hops
 
-def rank_path(path):
-    tail = path[-1]
-    if isinstance(tail,str) and tail.startswith("ASSIGN:"): cls=0
-    elif isinstance(tail,str) and tail.startswith("DD:"):   cls=1
-    else:                                                  cls=2
-    return (cls, len(path))
+def var_key(G, x):
+    """The tuple a var node was before interning: ("VAR", scope root row, origin_file, name)."""
+    return ("VAR", G.node_root[x], G.file(x), G.name(x))
+
+@lru_cache(maxsize=4)
+def node_rank(G):
+    """
+    Position of every node (vars, then DD/ASSIGN pseudo nodes) in the order the
+    pre-interning node ids compared: vars as var_key() tuples, pseudo nodes by label.
+    Int ids follow first-seen intern order, so equal-rank paths are tie-broken on this
+    instead (which paths survive MAX_PATHS_PER_VAR depends on it).
+    """
+    total = G.n + len(G.dds) + len(G.assigns)
+    file_rank = {f: r for r, f in enumerate(sorted(range(len(G.files)), key=G.files.__getitem__))}
+    name_rank = {k: r for r, k in enumerate(sorted(range(len(G.names)), key=G.names.__getitem__))}
+    order = sorted(range(G.n), key=lambda x: (G.node_root[x], file_rank[G.node_file[x]],
+                                              name_rank[G.node_name[x]]))
+    order += sorted(range(G.n, total), key=G.label)
+    rank = array("i", bytes(4 * total))
+    for r, x in enumerate(order):
+        rank[x] = r
+    return rank
+
+@lru_cache(maxsize=NEIGHBOR_CACHE)
+def sorted_neighbors(G, node):
+    """neighbors() in expansion order: pseudo nodes first, then by str() of the
+    pre-interning id (label / var_key tuple), as the tuple-keyed graph sorted them."""
+    return tuple(sorted(neighbors(G, node),
+                        key=lambda x: (True, str(var_key(G, x))) if G.is_var(x) else (False, G.label(x))))
+
+def rank_path(G, tail, depth):
+    if G.is_assign(tail): cls=0
+    elif G.is_dd(tail):   cls=1
+    else:                 cls=2
+    return (cls, depth)
+
+PATH_SNAPSHOT = 64                  # path nodes between membership snapshots
+
+class PathNode:
+    """
+    One search path as (parent, tail): prefixes are shared, never copied.
+    Membership: every PATH_SNAPSHOT levels a node freezes the set of tails above
+    it (`base`, up to `base_node`), so `x in path` walks at most that many links.
+    `jump` is a skew-binary jump pointer (depends on depth only) used to find where
+    two paths diverge in O(log depth); orders like the equivalent node list would,
+    comparing nodes by `key` (node_rank() of the tail, not the int id).
+    """
+    __slots__ = ("parent", "tail", "key", "depth", "jump", "base", "base_node")
+
+    def __init__(self, parent, tail, key):
+        self.parent = parent; self.tail = tail; self.key = key
+        if parent is None:
+            self.depth = 1; self.jump = self
+            self.base = frozenset(); self.base_node = None
+        else:
+            self.depth = parent.depth + 1
+            j = parent.jump
+            self.jump = j.jump if parent.depth - j.depth == j.depth - j.jump.depth else parent
+            self.base = parent.base; self.base_node = parent.base_node
+        if self.depth % PATH_SNAPSHOT == 0:
+            window = []
+            p = self
+            while p is not self.base_node:
+                window.append(p.tail); p = p.parent
+            self.base = self.base.union(window); self.base_node = self
+
+    def __contains__(self, x):
+        p = self
+        while p is not self.base_node:
+            if p.tail == x: return True
+            p = p.parent
+        return x in self.base
+
+    def __lt__(self, other):
+        # equal rank implies equal depth; sibling tails are unique (edges are
+        # expanded once), so the first difference sits just below the meeting point
+        a, b = self, other
+        if a is b: return False
+        while a.parent is not b.parent:
+            if a.jump is not b.jump: a, b = a.jump, b.jump
+            else:                    a, b = a.parent, b.parent
+        return a.key < b.key
+
+    def to_list(self):
+        out = []
+        p = self
+        while p is not None:
+            out.append(p.tail); p = p.parent
+        out.reverse()
+        return out
 
 def all_leaf_paths_ranked(G, start_nodes, max_depth=MAX_DEPTH, cap=MAX_PATHS_PER_VAR):
+    heap=[]; leaves=[]; seen=set()
+    pops=0; cycles=0
+    rank=node_rank(G)
+    for s in start_nodes:
+        heappush(heap,(rank_path(G,s,1), PathNode(None,s,rank[s])))
+    while heap and len(leaves)<cap:
+        _,path=heappop(heap); pops+=1
+        cur=path.tail
+        nxts=sorted_neighbors(G,cur)
+        if not nxts or path.depth>max_depth:
+            leaves.append(path.to_list()); continue
+        for nxt in nxts:
+            e=(cur,nxt)
+            if e in seen: 
+                continue
+            seen.add(e)
+            if G.is_var(nxt) and nxt in path:
+                cycles+=1
+                leaves.append(path.to_list()); continue
+            heappush(heap,(rank_path(G,nxt,path.depth+1), PathNode(path,nxt,rank[nxt])))
+    if PROF.enabled:
+        PROF.add("heap_pops", pops); PROF.add("heap_pushes", pops + len(heap))
+        PROF.add("edges_explored", len(seen)); PROF.add("cycles_cut", cycles)
+        PROF.add("leaf_paths", len(leaves))
+        if heap: PROF.add("cap_hits")
+    return leaves
+
+def _reference_paths(G, start_nodes, max_depth=MAX_DEPTH, cap=MAX_PATHS_PER_VAR):
+    """The pre-interning search: list paths of ("VAR", ...) tuples / "DD:x" labels."""
+    key = lambda x: var_key(G, x) if G.is_var(x) else G.label(x)
     heap=[]; leaves=[]; seen=set()
     for s in start_nodes:
-        heappush(heap,(rank_path([s]),[s]))
+        heappush(heap,(rank_path(G,s,1),[key(s)],[s]))
     while heap and len(leaves)<cap:
-        _,path=heappop(heap)
+        _,keys,path=heappop(heap)
         cur=path[-1]
         nxts=neighbors(G,cur)
         if not nxts or len(path)>max_depth:
             leaves.append(path); continue
-        for nxt in sorted(nxts, key=lambda x: (isinstance(x,tuple), str(x))):
+        for nxt in sorted(nxts, key=lambda x: (G.is_var(x), str(key(x)))):
             e=(cur,nxt)
-            if e in seen: 
+            if e in seen:
                 continue
             seen.add(e)
-            if isinstance(nxt,tuple) and nxt in path:
+            if G.is_var(nxt) and nxt in path:
                 leaves.append(path); continue
-            heappush(heap,(rank_path(path+[nxt]), path+[nxt]))
+            heappush(heap,(rank_path(G,nxt,len(path)+1), keys+[key(nxt)], path+[nxt]))
     return leaves
 
+def _random_rows(seed):
+    """(names, cleaned variables.csv rows) of a small random graph: 1-2 files sharing
+    names, some parents, DD/ASSIGN lists and direct sources, rows shuffled."""
+    import random
+    rnd = random.Random(seed)
+    names = [f"V{i}" for i in range(rnd.randint(4, 14))]
+    dds = ["DA", "DB", "DC"][:rnd.randint(1, 3)]
+    rows = []
+    for f in range(rnd.randint(1, 2)):
+        for v in rnd.sample(names, rnd.randint(2, len(names))):
+            dd = sorted(set(rnd.sample(dds, rnd.randint(1, len(dds))))) if rnd.random() < 0.25 else []
+            rows.append((v, f"/x/F{f}.cbl", rnd.choice(names) if rnd.random() < 0.3 else "", dd,
+                         rnd.sample(dd, 1) if dd and rnd.random() < 0.5 else [],
+                         rnd.sample(names, rnd.randint(1, 3)) if rnd.random() < 0.6 else []))
+    rnd.shuffle(rows)
+    return names, rows
+
+def check_order(seeds=300, cap=3):
+    """
+    all_leaf_paths_ranked() against _reference_paths() on random variables.csv rows
+    with a small cap, where the tie-break decides which paths are kept.
+    Returns [(seed, name)] that differ; seeds where the reference itself cannot
+    compare two paths (tuple vs label at the same position) are skipped.
+    """
+    bad = []
+    for seed in range(seeds):
+        names, rows = _random_rows(seed)
+        G = build_scoped(rows)
+        for name in names:
+            starts = list(G.nodes_named(name))
+            try:
+                want = _reference_paths(G, starts, cap=cap)
+            except TypeError:
+                continue
+            if all_leaf_paths_ranked(G, starts, cap=cap) != want:
+                bad.append((seed, name))
+        sorted_neighbors.cache_clear(); node_rank.cache_clear()
+    return bad
+
 # ---------------- PROC/JCL index helpers ----------------
 def load_csv_rows(path):
     if not os.path.exists(path): return []
@@ -266,24 +345,52 @@ def filter_rows_to_program(rows, prog):
     filt=[r for r in rows if (r.get("exec_pgm","") or "").upper()==prog.upper()]
     return filt or rows
 
-def same_dsn_or_tail(a: dict, b: dict) -> bool:
-    da=(a.get("dsn","") or "").upper()
-    db=(b.get("dsn","") or "").upper()
-    if da and db and da==db: return True
-    ta=(a.get("dsn_tail","") or "").upper()
-    tb=(b.get("dsn_tail","") or "").upper()
-    return (ta and tb and ta==tb)
-
 SYS_DDS = {"SYSOUT","SYSPRINT","SYSUDUMP","SYSIN","SYSABOUT"}
 
 def parse_sas_member_from_raw(raw: str) -> str:
     m=re.search(r"\bDSN\s*=\s*[^()]*\(\s*([A-Z0-9_]+)\s*\)", (raw or "").upper())
     return m.group(1) if m else ""
 
-def find_producer_and_inputs(all_proc_rows, all_jcl_rows, selected_row):
+class DsnIndex:
+    """
+    PROC then JCL rows indexed once by DSN, DSN tail and (file, step).
+    Row order is kept (rows are referenced by position), so lookups return
+    exactly what a linear scan in that order would.
+    """
+    def __init__(self, all_proc_rows, all_jcl_rows):
+        self.rows = list(all_proc_rows) + list(all_jcl_rows)
+        self.by_dsn = defaultdict(list); self.by_tail = defaultdict(list)
+        self.by_step = defaultdict(list)
+        for i, r in enumerate(self.rows):
+            d = (r.get("dsn","") or "").upper()
+            t = (r.get("dsn_tail","") or "").upper()
+            if d: self.by_dsn[d].append(i)
+            if t: self.by_tail[t].append(i)
+            self.by_step[(r.get("file",""), r.get("step",""))].append(i)
+        self.memo = {}
+
+    def related(self, row):
+        """Rows with the same DSN or the same DSN tail as row."""
+        d = (row.get("dsn","") or "").upper()
+        t = (row.get("dsn_tail","") or "").upper()
+        hit = set(self.by_dsn.get(d, ())) if d else set()
+        if t: hit.update(self.by_tail.get(t, ()))
+        return [self.rows[i] for i in sorted(hit)]
+
+    def same_step(self, file, step):
+        return [self.rows[i] for i in self.by_step.get((file, step), ())]
+
+def find_producer_and_inputs(dsn_index, selected_row):
     if not selected_row: return None, [], ""
-    related = [r for r in all_proc_rows if same_dsn_or_tail(r, selected_row)]
-    related += [r for r in all_jcl_rows if same_dsn_or_tail(r, selected_row)]
+    key = ((selected_row.get("dsn","") or "").upper(), (selected_row.get("dsn_tail","") or "").upper(),
+           selected_row.get("file"), selected_row.get("step"))
+    res = dsn_index.memo.get(key)
+    if res is None:
+        res = dsn_index.memo[key] = _find_producer_and_inputs(dsn_index, selected_row)
+    return res
+
+def _find_producer_and_inputs(dsn_index, selected_row):
+    related = dsn_index.related(selected_row)
 
     def is_other_step(r):
         return not (r.get("file")==selected_row.get("file") and r.get("step")==selected_row.get("step"))
@@ -302,8 +409,7 @@ def find_producer_and_inputs(all_proc_rows, all_jcl_rows, selected_row):
     p_file, p_step = producer.get("file",""), producer.get("step","")
     out_dd = (producer.get("ddname","") or "").upper()
 
-    same_step = [r for r in all_proc_rows if r.get("file","")==p_file and r.get("step","")==p_step]
-    same_step += [r for r in all_jcl_rows  if r.get("file","")==p_file and r.get("step","")==p_step]
+    same_step = dsn_index.same_step(p_file, p_step)
 
     inputs=[]; sas_member=""
     for r in same_step:
@@ -320,8 +426,8 @@ def find_producer_and_inputs(all_proc_rows, all_jcl_rows, selected_row):
     return producer, inputs, sas_member
 
 # ---------------- enhancement & fallbacks ----------------
-def disp(n):  # n is ("VAR", root, file, name) or "DD:xxx"/"ASSIGN:yyy"
-    return n[3] if isinstance(n,tuple) else n
+def disp(G, n):  # var node -> name; pseudo node -> "DD:xxx"/"ASSIGN:yyy"
+    return G.label(n)
 
 def build_lookups(procs_rows, jcl_rows):
     def N(x): return tok_only(x or "")
@@ -329,17 +435,17 @@ def build_lookups(procs_rows, jcl_rows):
     by_ddname_jcl=defaultdict(list)
     for r in procs_rows: by_ddname_proc[N(r.get("ddname"))].append(r)
     for r in jcl_rows:  by_ddname_jcl[N(r.get("ddname"))].append(r)
-    return by_ddname_proc, by_ddname_jcl
+    return by_ddname_proc, by_ddname_jcl, DsnIndex(procs_rows, jcl_rows)
 
 def collect_own_and_ancestor_sets(G, node):
     """Return (all_dds, all_assigns) available at node or any ancestor in scope."""
     dds=set(); ats=set()
     cur=node; seen=set()
-    while isinstance(cur,tuple) and cur not in seen:
+    while cur >= 0 and G.is_var(cur) and cur not in seen:
         seen.add(cur)
-        dds |= G["from_dd_of"].get(cur,set())
-        ats  |= G["assign_of"].get(cur,set())
-        cur = G["parent_of"].get(cur)
+        dds.update(G.dds[d] for d in G.from_dd.row(cur))
+        ats.update(G.assigns[a] for a in G.assign.row(cur))
+        cur = G.parent[cur]
     return dds, ats
 
 def choose_final_key(assigns_on_path, dds_on_path, node_dds, node_assigns, prefer_assign=True):
@@ -369,26 +475,25 @@ def choose_final_key(assigns_on_path, dds_on_path, node_dds, node_assigns, prefe
             return "ASSIGN", k, "yes", "node/ancestor ASSIGN"
     return "", "", "yes", "no DD/ASSIGN found anywhere"
 
-def enhance_one(G, path, lookups, all_proc_rows, all_jcl_rows):
-    by_ddname_proc, by_ddname_jcl = lookups
-    origin_for = G["origin_for"]
+def enhance_one(G, path, lookups):
+    by_ddname_proc, by_ddname_jcl, dsn_index = lookups
 
-    start_name = disp(path[0])
-    shows = [disp(n) for n in path]
+    start_name = disp(G, path[0])
+    shows = [disp(G, n) for n in path]
 
     cob_file=""; prog_name=""
     for n in path:
-        if isinstance(n,tuple):
-            cob_file = origin_for.get(n,"")
+        if G.is_var(n):
+            cob_file = G.file(n)
             if cob_file:
                 prog_name = program_name_from_file(cob_file)
                 break
 
-    assigns=[tok_only(x[7:]) for x in shows if isinstance(x,str) and x.startswith("ASSIGN:")]
-    dds    =[tok_only(x[3:]) for x in shows if isinstance(x,str) and x.startswith("DD:")]
+    assigns=[tok_only(G.label(n)[7:]) for n in path if G.is_assign(n)]
+    dds    =[tok_only(G.label(n)[3:]) for n in path if G.is_dd(n)]
 
     # own + ancestors’ sets (for fallback)
-    tail_node = next((n for n in reversed(path) if isinstance(n,tuple)), path[0])
+    tail_node = next((n for n in reversed(path) if G.is_var(n)), path[0])
     node_dds, node_assigns = collect_own_and_ancestor_sets(G, tail_node)
 
     # always produce a key
@@ -406,7 +511,7 @@ def enhance_one(G, path, lookups, all_proc_rows, all_jcl_rows):
     producer_file = producer_step = producer_exec = ""
     input_files=[]; sas_member=""
     if chosen:
-        prod, inputs, sas_mem = find_producer_and_inputs(all_proc_rows, all_jcl_rows, chosen)
+        prod, inputs, sas_mem = find_producer_and_inputs(dsn_index, chosen)
         if prod:
             producer_file = prod.get("file","")
             producer_step = prod.get("step","")
@@ -433,55 +538,439 @@ def enhance_one(G, path, lookups, all_proc_rows, all_jcl_rows):
         "cobol_file_hint": cob_file
     }
 
+def backtrace_rows(G, starts, lookups, cap=MAX_PATHS_PER_VAR):
+    """Enhanced rows for one variable's start nodes, best-ranked first, deduped."""
+    out=[]; seen=set()
+    t0 = time.perf_counter()
+    paths = all_leaf_paths_ranked(G, starts, cap=cap)
+    t1 = time.perf_counter()
+    for p in paths:
+        row = enhance_one(G, p, lookups)
+        key = row_key(row)
+        if key in seen: 
+            continue
+        seen.add(key)
+        out.append(row)
+    if PROF.enabled:
+        PROF.add_time("search", t1 - t0); PROF.add_time("enhance", time.perf_counter() - t1)
+        PROF.add("rows", len(out))
+    return out
+
+def row_key(row):
+    """64-bit dedupe key of an enhanced row (var, key type, key, trace path)."""
+    return hash((row["copybook_variable"], row["final_key_type"], row["final_key"], row["trace_path"]))
+
+# ---------------- batch mode ----------------
+def best_origins(G, start_nodes):
+    """
+    One traversal for many targets. Origins are the nodes a search stops at (ASSIGN, DD
+    without ASSIGN, var without hops); a node's best origin is the lowest rank_path class
+    (ASSIGN < DD < var), then the fewest hops. A forward pass collects every node reachable
+    from start_nodes, then a reverse multi-source BFS per class labels them all at once
+    (cycles need nothing special; nodes that only reach cycles get no origin).
+    Returns (cls, dist, succ): succ[v] is v's lowest node_rank() neighbor one hop closer,
+    the tie-break the ranked search applies to equal-rank paths.
+    """
+    rank = node_rank(G)
+    radj = defaultdict(list)
+    seen = set(start_nodes); stack = list(seen)
+    terminals = ([], [], [])
+    while stack:
+        v = stack.pop()
+        nxts = sorted_neighbors(G, v)
+        if not nxts:
+            terminals[rank_path(G, v, 0)[0]].append(v)
+        for w in nxts:
+            radj[w].append(v)
+            if w not in seen:
+                seen.add(w); stack.append(w)
+    cls = {}; dist = {}
+    for c, seeds in enumerate(terminals):
+        frontier = [v for v in seeds if v not in cls]
+        for v in frontier:
+            cls[v] = c; dist[v] = 0
+        d = 0
+        while frontier:
+            d += 1; nxt = []
+            for w in frontier:
+                for v in radj.get(w, ()):
+                    if v not in cls:
+                        cls[v] = c; dist[v] = d; nxt.append(v)
+            frontier = nxt
+    succ = {}
+    for v, d in dist.items():
+        if d:
+            c = cls[v]
+            succ[v] = min((w for w in neighbors(G, v) if cls.get(w) == c and dist[w] == d - 1),
+                          key=rank.__getitem__)
+    if PROF.enabled:
+        PROF.add("batch_nodes", len(seen)); PROF.add("batch_edges", sum(map(len, radj.values())))
+        PROF.add("batch_no_origin", len(seen) - len(cls))
+    return cls, dist, succ
+
+def best_path(G, start, succ, dist, max_depth=MAX_DEPTH):
+    """start -> best origin along succ; without an origin, first-neighbor walk cut at a cycle."""
+    path = [start]
+    if start in dist:
+        while path[-1] in succ:
+            path.append(succ[path[-1]])
+        return path
+    on_path = {start}
+    while len(path) <= max_depth:
+        nxt = next((w for w in sorted_neighbors(G, path[-1]) if w not in on_path), None)
+        if nxt is None:
+            break
+        path.append(nxt); on_path.add(nxt)
+    return path
+
+def backtrace_batch(G, names, lookups):
+    """Rows for many target variables from one shared traversal: one row per start node
+    (best origin), names in sorted order, deduped like backtrace_rows."""
+    starts_by_name = {}
+    for name in sorted(set(names)):
+        starts = list(G.nodes_named(name))
+        if starts:
+            starts_by_name[name] = starts
+    with PROF.phase("batch_search"):
+        _, dist, succ = best_origins(G, [s for ss in starts_by_name.values() for s in ss])
+    out=[]; seen=set()
+    with PROF.phase("batch_enhance"):
+        for name, starts in starts_by_name.items():
+            for s in starts:
+                row = enhance_one(G, best_path(G, s, succ, dist), lookups)
+                key = row_key(row)
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.append(row)
+    return out
+
+def check_batch(seeds=300):
+    """
+    best_path() per start node against the ranked search on the check_order() graphs:
+    of the search's leaf paths that end at the start's best origin class in dist + 1
+    nodes, the batch path must be the lowest in node_rank() order.
+    Returns [(seed, start node)] that differ.
+    """
+    bad = []
+    for seed in range(seeds):
+        _, rows = _random_rows(seed)
+        G = build_scoped(rows)
+        rank = node_rank(G)
+        for s in range(G.n):
+            cls, dist, succ = best_origins(G, [s])
+            if s not in dist:
+                continue
+            best = [p for p in all_leaf_paths_ranked(G, [s], cap=1 << 16)
+                    if len(p) == dist[s] + 1 and not neighbors(G, p[-1])
+                    and rank_path(G, p[-1], 0)[0] == cls[s]]
+            if best and best_path(G, s, succ, dist) != min(best, key=lambda p: [rank[x] for x in p]):
+                bad.append((seed, s))
+        sorted_neighbors.cache_clear(); node_rank.cache_clear()
+    return bad
+
+def read_targets(path):
+    with io.open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return [tok_only(x) for x in f if tok_only(x)]
+
+# ---------------- forward impact ----------------
+def impact_starts(G, spec, lookups=None):
+    """
+    Start nodes for a downstream walk: a variable name, "DD:x", "ASSIGN:x", or "DSN:x"
+    (every DD/ASSIGN whose ddname the PROC/JCL rows bind to that DSN or DSN tail).
+    A JCL ddname also reaches the FD/SELECT handles assigned to it (G.ddname_dds).
+    """
+    kind, _, val = spec.partition(":")
+    kind = kind.strip().upper()
+    if not val:
+        return list(G.nodes_named(tok_only(spec)))
+    if kind == "DD":
+        return [G.dd_node(d) for d in G.dds_for_ddname(tok_only(val))]
+    if kind == "ASSIGN":
+        a = G.assigns.get(tok_only(val)); return [G.assign_node(a)] if a >= 0 else []
+    if kind == "DSN":
+        if lookups is None:
+            return []
+        dsn_index = lookups[2]; key = val.strip().upper()
+        hit = set(dsn_index.by_dsn.get(key, ())) | set(dsn_index.by_tail.get(key, ()))
+        out = []
+        for dd in sorted({tok_only(dsn_index.rows[i].get("ddname")) for i in hit} - {""}):
+            out.extend(G.dd_node(d) for d in G.dds_for_ddname(dd))
+            a = G.assigns.get(dd)
+            if a >= 0: out.append(G.assign_node(a))
+        return list(dict.fromkeys(out))
+    return list(G.nodes_named(tok_only(spec)))
+
+def downstream(G, node):
+    """Reverse of neighbors(): nodes whose value node feeds (children, consumers);
+    a DD/ASSIGN start feeds the variables bound to it."""
+    if G.is_dd(node):
+        return G.dd_nodes.row(node - G.n)
+    if G.is_assign(node):
+        return G.assign_nodes.row(node - G.assign_node(0))
+    kids, users = G.children.row(node), G.consumers.row(node)
+    return kids if not users else (users if not kids else sorted(set(kids).union(users)))
+
+def impact(G, start_nodes, max_depth=IMPACT_MAX_DEPTH, max_fanout=IMPACT_MAX_FANOUT, limit=IMPACT_LIMIT):
+    """
+    Breadth-first walk downstream from start_nodes over the index's reverse edges.
+    Yields (node, depth, via) as nodes are first reached (starts at depth 0, via -1),
+    so callers can stream or stop early. DD/ASSIGN nodes of reached variables are
+    yielded as sinks (the records/files the value ends up in) and not expanded.
+    Nodes with more than max_fanout successors follow only the first max_fanout.
+    At most limit nodes are yielded in total (0 = no limit), starts and sinks included.
+    """
+    seen = bytearray(G.n + len(G.dds) + len(G.assigns))
+    frontier = []
+    for s in start_nodes:
+        if limit and len(frontier) >= limit:
+            break
+        if not seen[s]:
+            seen[s] = 1; frontier.append(s)
+            yield s, 0, -1
+    reached = len(frontier); fanout_cuts = 0; depth = 0
+    while frontier and depth < max_depth and not (limit and reached >= limit):
+        depth += 1
+        nxt = []
+        for x in frontier:
+            succ = downstream(G, x)
+            if max_fanout and len(succ) > max_fanout:
+                succ = succ[:max_fanout]; fanout_cuts += 1
+            for y in succ:
+                if not seen[y]:
+                    seen[y] = 1; nxt.append(y); reached += 1
+                    yield y, depth, x
+                    if limit and reached >= limit: break
+            if limit and reached >= limit: break
+            if G.is_var(x) and depth > 1:
+                for y in ([G.dd_node(d) for d in G.from_dd.row(x)] +
+                          [G.assign_node(a) for a in G.assign.row(x)]):
+                    if not seen[y]:
+                        seen[y] = 1; reached += 1
+                        yield y, depth, x
+                        if limit and reached >= limit: break
+                if limit and reached >= limit: break
+        frontier = [y for y in nxt if G.is_var(y)]
+    PROF.add("impact_reached", reached); PROF.add("impact_fanout_cuts", fanout_cuts)
+    if frontier and depth >= max_depth: PROF.add("impact_depth_cuts")
+
+IMPACT_FIELDS = ["start", "node", "kind", "depth", "via", "origin_file"]
+
+def impact_rows(G, spec, lookups=None, **limits):
+    """impact() as IMPACT_FIELDS dicts (labels instead of node ids)."""
+    for x, depth, via in impact(G, impact_starts(G, spec, lookups), **limits):
+        yield {"start": spec, "node": G.label(x),
+               "kind": "VAR" if G.is_var(x) else ("DD" if G.is_dd(x) else "ASSIGN"),
+               "depth": depth, "via": G.label(via) if via >= 0 else "",
+               "origin_file": G.file(x) if G.is_var(x) else ""}
+
+def check_dsn_impact(base=None, seed=7, size="tiny"):
+    """
+    Index a generated corpus (cobolindexer lineage.idx + buildindex jcl_index.csv) and
+    walk downstream from every DSN a JCL step binds to a ddname some SELECT assigns.
+    Returns the "DSN:x" specs that reach no variable; [] means DSNs resolve to handles.
+    """
+    import shutil, tempfile
+    import gencorpus, cobolindexer, buildindex
+    own = base is None
+    base = base or tempfile.mkdtemp(prefix="bt-impact-")
+    try:
+        gencorpus.generate(base, seed, **gencorpus.PRESETS[size])
+        store, _ = cobolindexer.build_store(cobolindexer.list_cobol_files(os.path.join(base, "cobol")))
+        cobolindexer.write_lineage_index(store, os.path.join(base, "lineage.idx"))
+        jcl_csv = os.path.join(base, "jcl_index.csv")
+        buildindex.write_index("jcl", os.path.join(base, "jcl"), buildindex.JCL_EXTS, jcl_csv,
+                               buildindex.JCL_FIELDS, 1)
+        G = open_index(os.path.join(base, "lineage.idx"))
+        jcl_rows = load_csv_rows(jcl_csv)
+        lookups = build_lookups([], jcl_rows)
+        assigned = set(store.select_map.values())
+        specs = sorted({"DSN:" + r["dsn"] for r in jcl_rows if r["dsn"] and r["ddname"] in assigned})
+        return [spec for spec in specs
+                if not any(row["kind"] == "VAR" for row in impact_rows(G, spec, lookups, limit=100))]
+    finally:
+        if own:
+            shutil.rmtree(base, ignore_errors=True)
+
 # ---------------- main ----------------
+OUT_FIELDS = [
+    "copybook_variable","final_key_type","final_key",
+    "fallback_used","fallback_detail","raw_node_dds","raw_node_assigns",
+    "jcl_rows","proc_rows",
+    "producer_file","producer_step","producer_exec",
+    "input_files","sas_member",
+    "trace_path","cobol_file_hint"
+]
+
+def output_path(path, compress=OUT_COMPRESS):
+    return path + {"": "", "gzip": ".gz", "zstd": ".zst"}[compress]
+
+class RowSink:
+    """
+    Enhanced rows streamed to CSV, plain or compressed. checkpoint() ends the current
+    gzip member / zstd frame (concatenations of both are valid streams) and returns the
+    byte offset of the raw file; opening with resume_at truncates back to such an offset
+    and appends, so rows written after the last checkpoint are dropped, never duplicated.
+    """
+    def __init__(self, path, compress=OUT_COMPRESS, resume_at=None):
+        if compress == "zstd" and zstandard is None:
+            raise SystemExit("OUT_COMPRESS = 'zstd' needs the zstandard package (or use 'gzip')")
+        self.compress = compress
+        if resume_at is None:
+            self.raw = io.open(path, "wb")
+        else:
+            self.raw = io.open(path, "r+b")
+            self.raw.truncate(resume_at); self.raw.seek(resume_at)
+        self._open()
+        if resume_at is None:
+            self.writer.writeheader()
+
+    def _open(self):
+        if self.compress == "gzip":
+            self.z = gzip.GzipFile(fileobj=self.raw, mode="wb")
+        elif self.compress == "zstd":
+            self.z = zstandard.ZstdCompressor().stream_writer(self.raw, closefd=False)
+        else:
+            self.z = None
+        self.text = io.TextIOWrapper(self.z or self.raw, encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.text, fieldnames=OUT_FIELDS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def _end(self):
+        self.text.flush(); self.text.detach()
+        if self.z is not None:
+            self.z.close()
+        self.raw.flush()
+
+    def checkpoint(self):
+        self._end()
+        os.fsync(self.raw.fileno())
+        offset = self.raw.tell()
+        self._open()
+        return offset
+
+    def close(self):
+        self._end()
+        self.raw.close()
+
+def write_rows(path, rows):
+    sink = RowSink(path)
+    sink.write(rows)
+    sink.close()
+
+# ---------------- checkpoint ----------------
+def run_signature(G_source):
+    """Inputs + settings a checkpoint is only valid for."""
+    def st(p):
+        try:
+            s = os.stat(p); return [p, s.st_size, s.st_mtime_ns]
+        except OSError:
+            return [p, None, None]
+    return {"inputs": [st(G_source), st(CSV_PROCS), st(CSV_JCL)],
+            "settings": [QUERY, INCLUDE_ONLY_COPYBOOK, PREFER_ASSIGN_OVER_DD, MAX_DEPTH,
+                         MAX_PATHS_PER_VAR, OUT_COMPRESS]}
+
+def load_checkpoint(path, signature):
+    try:
+        with io.open(path, "r", encoding="utf-8") as f:
+            ck = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return ck if ck.get("signature") == signature else None
+
+def save_checkpoint(path, signature, done, last_name, offset, rows):
+    tmp = path + ".tmp"
+    with io.open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"signature": signature, "done": done, "last_name": last_name,
+                   "offset": offset, "rows": rows}, f)
+    os.replace(tmp, path)
+
 def main():
+    global PROF
+    PROF = runreport.start("backtrace6", PROFILE)
     allow = copybook_names(CPY_DIR) if INCLUDE_ONLY_COPYBOOK else None
-    if not os.path.exists(CSV_VARS):
+    with PROF.phase("load_graph"):
+        G = load_graph()
+    if G is None:
         print("variables.csv not found"); return
-    G = load_vars_scoped(CSV_VARS)
 
     # collect start nodes (optionally restrict to copybook names)
     start_nodes_by_name = defaultdict(list)
-    for n in G["nodes"]:
-        name = G["name_of_node"][n]
-        if INCLUDE_ONLY_COPYBOOK and allow and name not in allow:
-            continue
-        start_nodes_by_name[name].append(n)
-
     if QUERY:
         q = tok_only(QUERY)
-        start_nodes_by_name = {q: start_nodes_by_name.get(q, [])}
-
-    procs = load_csv_rows(CSV_PROCS)
-    jcls  = load_csv_rows(CSV_JCL)
-    lookups = build_lookups(procs, jcls)
-
-    out=[]; seen=set()
-    for name, starts in sorted(start_nodes_by_name.items()):
-        if not starts: 
-            continue
-        for p in all_leaf_paths_ranked(G, starts):
-            row = enhance_one(G, p, lookups, procs, jcls)
-            key=(row["copybook_variable"], row["final_key_type"], row["final_key"], row["trace_path"])
-            if key in seen: 
+        if not (INCLUDE_ONLY_COPYBOOK and allow and q not in allow):
+            start_nodes_by_name[q] = list(G.nodes_named(q))
+    elif not IMPACT:
+        for n in range(G.n):
+            name = G.name(n)
+            if INCLUDE_ONLY_COPYBOOK and allow and name not in allow:
                 continue
-            seen.add(key)
-            out.append(row)
-
-    with io.open(CSV_OUT,"w",newline="",encoding="utf-8") as f:
-        w=csv.DictWriter(f, fieldnames=[
-            "copybook_variable","final_key_type","final_key",
-            "fallback_used","fallback_detail","raw_node_dds","raw_node_assigns",
-            "jcl_rows","proc_rows",
-            "producer_file","producer_step","producer_exec",
-            "input_files","sas_member",
-            "trace_path","cobol_file_hint"
-        ])
-        w.writeheader()
-        for r in out:
-            w.writerow(r)
-
-    print(f"Wrote {CSV_OUT} (rows={len(out)})")
+            start_nodes_by_name[name].append(n)
+
+    with PROF.phase("lookups"):
+        procs = load_csv_rows(CSV_PROCS)
+        jcls  = load_csv_rows(CSV_JCL)
+        lookups = build_lookups(procs, jcls)
+
+    if IMPACT:
+        t0 = time.perf_counter(); n = 0
+        with PROF.phase("impact"), io.open(CSV_IMPACT_OUT, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=IMPACT_FIELDS)
+            w.writeheader()
+            for row in impact_rows(G, IMPACT, lookups):
+                w.writerow(row); n += 1
+        print(f"Wrote {CSV_IMPACT_OUT} (rows={n}, {time.perf_counter()-t0:.2f}s)")
+        if PROF.enabled:
+            print(f"Wrote {PROF.write(REPORT_JSON)}")
+        return
+
+    if BATCH:
+        targets = read_targets(BATCH_TARGETS) if BATCH_TARGETS else list(start_nodes_by_name)
+        if INCLUDE_ONLY_COPYBOOK and allow:
+            targets = [t for t in targets if t in allow]
+        t0 = time.perf_counter()
+        out = backtrace_batch(G, targets, lookups)
+        with PROF.phase("write_csv"):
+            write_rows(output_path(CSV_BATCH_OUT), out)
+        print(f"Wrote {output_path(CSV_BATCH_OUT)} (rows={len(out)}, {len(set(targets))} targets in {time.perf_counter()-t0:.2f}s)")
+        if PROF.enabled:
+            print(f"Wrote {PROF.write(REPORT_JSON)}")
+        return
+
+    # stream rows per start var; every CHECKPOINT_EVERY vars record how far the output got
+    out_path = output_path(CSV_OUT)
+    ck_path = out_path + ".ckpt"
+    items = sorted(start_nodes_by_name.items())
+    signature = run_signature(LINEAGE_INDEX if index_is_fresh(LINEAGE_INDEX, CSV_VARS) else CSV_VARS)
+    ck = load_checkpoint(ck_path, signature) if CHECKPOINT_EVERY else None
+    if ck and not (ck["done"] <= len(items) and (ck["done"] == 0 or items[ck["done"] - 1][0] == ck["last_name"])
+                   and os.path.exists(out_path) and os.path.getsize(out_path) >= ck["offset"]):
+        ck = None
+    done, n_rows = (ck["done"], ck["rows"]) if ck else (0, 0)
+    if ck:
+        print(f"Resuming {out_path} after {done} of {len(items)} variables ({n_rows} rows)")
+    sink = RowSink(out_path, resume_at=ck["offset"] if ck else None)
+    with PROF.phase("backtrace"):
+        for i in range(done, len(items)):
+            name, starts = items[i]
+            if starts:
+                PROF.add("start_vars")
+                rows = backtrace_rows(G, starts, lookups)
+                sink.write(rows); n_rows += len(rows)
+            if CHECKPOINT_EVERY and (i + 1) % CHECKPOINT_EVERY == 0 and i + 1 < len(items):
+                save_checkpoint(ck_path, signature, i + 1, name, sink.checkpoint(), n_rows)
+    sink.close()
+    if os.path.exists(ck_path):
+        os.remove(ck_path)
+
+    print(f"Wrote {out_path} (rows={n_rows})")
+    if PROF.enabled:
+        info = sorted_neighbors.cache_info()
+        PROF.note(nodes=G.n, neighbor_cache_hits=info.hits, neighbor_cache_misses=info.misses,
+                  dsn_memo=len(lookups[2].memo))
+        print(f"Wrote {PROF.write(REPORT_JSON)}")
 
 if __name__=="__main__":
     main()
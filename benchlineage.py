@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchlineage.py — offline benchmark of the lineage pipeline on a generated corpus
+- Generates (or reuses) a seeded corpus with gencorpus.py under BENCH_DIR/<size>-<seed>
+- Runs each stage as its own process in that folder: cobolindexer (cold, then warm
+  incremental), buildindex, backtrace6, datasetgraph
+- Records wall time, peak RSS (per process, from wait4) and exit code per stage
+- Saves BENCH_DIR/results/<commit>-<size>-<stamp>.json; compare_results() diffs two runs
+No network, no extra packages (Linux/macOS for wait4). No CLI; edit the configuration below.
+"""
+
+import os, sys, json, time, shutil, platform, subprocess, tempfile, threading
+
+import gencorpus
+
+# ---------------- configuration ----------------
+REPO = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(os.getcwd(), "bench")
+SIZE = "small"                      # gencorpus.PRESETS key
+SEED = 1
+REGENERATE = False                  # True -> rewrite the corpus even if it exists
+STAGE_TIMEOUT = 3600                # seconds per stage
+COMPARE_WITH = ""                   # path of an earlier results JSON to diff against
+
+STAGES = [
+    # name,               script,             removed before the run (cold start)
+    ("cobolindexer_cold", "cobolindexer.py",  [".cobolindex", "variables.csv", "lineage.idx"]),
+    ("cobolindexer_warm", "cobolindexer.py",  []),
+    ("buildindex",        "buildindex.py",    []),
+    ("backtrace6",        "backtrace6.py",    []),
+    ("datasetgraph",      "datasetgraph.py",  []),
+]
+
+# ---------------- helpers ----------------
+def git_commit(repo=REPO):
+    try:
+        sha = subprocess.run(["git", "-C", repo, "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, timeout=60).stdout.strip()
+        dirty = subprocess.run(["git", "-C", repo, "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, timeout=60).stdout.strip()
+        return (sha or "unknown") + ("-dirty" if dirty else "")
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+def _rss_mib(ru_maxrss):
+    # Linux reports KiB, macOS bytes
+    return round(ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+def run_stage(script, cwd, timeout=STAGE_TIMEOUT):
+    """Run one pipeline script in cwd -> dict(seconds, peak_rss_mib, returncode, last_line)."""
+    env = dict(os.environ, PYTHONPATH=REPO + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryFile("w+") as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO, script)],
+                                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        try:
+            _, status, ru = os.wait4(proc.pid, 0)      # reap ourselves to get this child's rusage
+        finally:
+            timer.cancel()
+        secs = time.perf_counter() - t0
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        log.seek(0)
+        lines = log.read().strip().splitlines()
+    return {"seconds": round(secs, 3), "peak_rss_mib": _rss_mib(ru.ru_maxrss),
+            "returncode": proc.returncode, "last_line": lines[-1] if lines else ""}
+
+def corpus_dir(size=SIZE, seed=SEED):
+    return os.path.join(BENCH_DIR, f"{size}-{seed}")
+
+def ensure_corpus(size=SIZE, seed=SEED, regenerate=REGENERATE):
+    root = corpus_dir(size, seed)
+    stamp = os.path.join(root, "corpus.json")
+    if not regenerate and os.path.exists(stamp):
+        with open(stamp, encoding="utf-8") as f:
+            return root, json.load(f)
+    t0 = time.perf_counter()
+    stats = gencorpus.generate(root, seed, **gencorpus.PRESETS[size])
+    stats["generate_seconds"] = round(time.perf_counter() - t0, 3)
+    stats["size"] = size
+    with open(stamp, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    return root, stats
+
+# ---------------- runner ----------------
+def run_bench(size=SIZE, seed=SEED):
+    root, corpus = ensure_corpus(size, seed)
+    result = {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "cpus": os.cpu_count(), "corpus": corpus, "stages": {}}
+    for name, script, remove in STAGES:
+        for rel in remove:
+            p = os.path.join(root, rel)
+            if os.path.isdir(p): shutil.rmtree(p)
+            elif os.path.exists(p): os.remove(p)
+        r = run_stage(script, root)
+        result["stages"][name] = r
+        print(f"{name:<20} {r['seconds']:>9.2f}s {r['peak_rss_mib']:>9.1f} MiB  rc={r['returncode']}  {r['last_line'][:80]}")
+    out_dir = os.path.join(BENCH_DIR, "results")
+    os.makedirs(out_dir, exist_ok=True)
+    out = os.path.join(out_dir, f"{result['commit']}-{size}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Wrote {out}")
+    return out, result
+
+def compare_results(old_path, new_path):
+    """Print per-stage time/RSS ratios new vs old; returns {stage: (time_ratio, rss_ratio)}."""
+    with open(old_path, encoding="utf-8") as f: a = json.load(f)
+    with open(new_path, encoding="utf-8") as f: b = json.load(f)
+    if a.get("corpus", {}).get("lines") != b.get("corpus", {}).get("lines"):
+        print("warning: corpora differ")
+    out = {}
+    print(f"{'stage':<20} {a['commit']:>12} -> {b['commit']:<12}")
+    for name, rb in b["stages"].items():
+        ra = a["stages"].get(name)
+        if not ra: continue
+        tr = rb["seconds"] / ra["seconds"] if ra["seconds"] else float("nan")
+        mr = rb["peak_rss_mib"] / ra["peak_rss_mib"] if ra["peak_rss_mib"] else float("nan")
+        out[name] = (tr, mr)
+        print(f"{name:<20} {ra['seconds']:>8.2f}s -> {rb['seconds']:>8.2f}s (x{tr:.2f})   "
+              f"{ra['peak_rss_mib']:>7.1f} -> {rb['peak_rss_mib']:>7.1f} MiB (x{mr:.2f})")
+    return out
+
+def main():
+    out, _ = run_bench(SIZE, SEED)
+    if COMPARE_WITH:
+        compare_results(COMPARE_WITH, out)
+
+if __name__ == "__main__":
+    main()
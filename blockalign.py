@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+blockalign.py — sequence alignment for the DOCX comparators (body blocks, rows, ...)
+- get_opcodes(a, b, engine) returns difflib-style (tag, i1, i2, j1, j2) opcodes
+  ("equal" / "replace" / "delete" / "insert"), so callers keep their opcode handling
+- Items (block signatures) are interned to ints once; the rest compares ints
+- "patience": common prefix/suffix trimmed, then items unique on both sides anchor the
+  alignment (longest increasing run of them), recursively between anchors; stretches
+  without unique items go to Myers O(ND) in linear space
+- "myers": Myers only; "difflib": SequenceMatcher(autojunk=False), the old behaviour
+No quadratic fallback: repeated boilerplate costs O((N+M)·min(D, MYERS_MAX_D)), not O(N·M).
+bench() times the engines on large synthetic documents.
+"""
+
+import time, random
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+ENGINE = "patience"
+MYERS_MAX_D = 256       # edit-distance budget per Myers step; beyond it split heuristically
+
+# ---------------- interning ----------------
+def intern_pair(a, b):
+    """Map two sequences of hashable items to int lists sharing one id space."""
+    ids = {}
+    ia = [ids.setdefault(x, len(ids)) for x in a]
+    ib = [ids.setdefault(x, len(ids)) for x in b]
+    return ia, ib
+
+# ---------------- Myers (linear space) ----------------
+def _middle_snake(a, alo, ahi, b, blo, bhi, max_d=MYERS_MAX_D):
+    """Middle snake of the shortest edit script: (x, y, u, v) in absolute indices, the
+    snake running from (x, y) to (u, v). Both ranges non-empty, ends differ.
+    Past max_d edits per side the furthest forward point is returned as an empty snake
+    (GNU diff's "too expensive" cut): the split is no longer optimal, the cost stays
+    O((N+M)·max_d)."""
+    N, M = ahi - alo, bhi - blo
+    delta = N - M
+    odd = delta & 1
+    size = N + M + 2
+    off = size
+    vf = [0] * (2 * size + 1)
+    vb = [0] * (2 * size + 1)
+    for d in range((N + M + 1) // 2 + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[off + k - 1] < vf[off + k + 1]):
+                x = vf[off + k + 1]
+            else:
+                x = vf[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < N and y < M and a[alo + x] == b[blo + y]:
+                x += 1; y += 1
+            vf[off + k] = x
+            kb = delta - k
+            if odd and -(d - 1) <= kb <= d - 1 and x + vb[off + kb] >= N:
+                return alo + x0, blo + y0, alo + x, blo + y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[off + k - 1] < vb[off + k + 1]):
+                x = vb[off + k + 1]
+            else:
+                x = vb[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < N and y < M and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1; y += 1
+            vb[off + k] = x
+            kf = delta - k
+            if not odd and -d <= kf <= d and x + vf[off + kf] >= N:
+                return ahi - x, bhi - y, ahi - x0, bhi - y0
+        if d >= max_d:
+            best = max((k for k in range(-d, d + 1, 2) if vf[off + k] <= N and 0 <= vf[off + k] - k <= M),
+                       key=lambda k: 2 * vf[off + k] - k)
+            x = vf[off + best]
+            return alo + x, blo + x - best, alo + x, blo + x - best
+    raise AssertionError("no middle snake")
+
+def _trim(a, alo, ahi, b, blo, bhi, out):
+    """Emit the common prefix/suffix matches; returns the remaining ranges."""
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        out.append((alo, blo)); alo += 1; blo += 1
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1; bhi -= 1; out.append((ahi, bhi))
+    return alo, ahi, blo, bhi
+
+def myers_matches(a, b, alo=0, ahi=None, blo=0, bhi=None, out=None, max_d=None):
+    """Matched (i, j) pairs of a shortest edit script between a[alo:ahi] and b[blo:bhi]."""
+    ahi = len(a) if ahi is None else ahi
+    bhi = len(b) if bhi is None else bhi
+    out = [] if out is None else out
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        alo, ahi, blo, bhi = _trim(a, alo, ahi, b, blo, bhi, out)
+        if alo == ahi or blo == bhi:
+            continue
+        x, y, u, v = _middle_snake(a, alo, ahi, b, blo, bhi, max_d or MYERS_MAX_D)
+        for k in range(u - x):
+            out.append((x + k, y + k))
+        stack.append((alo, x, blo, y))
+        stack.append((u, ahi, v, bhi))
+    return out
+
+# ---------------- patience ----------------
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """Items occurring exactly once in both ranges, as (i, j) along the longest chain
+    increasing in both i and j."""
+    count = {}
+    for i in range(alo, ahi):
+        x = a[i]
+        c = count.get(x)
+        count[x] = [1, i, 0, -1] if c is None else [c[0] + 1, i, 0, -1]
+    for j in range(blo, bhi):
+        c = count.get(b[j])
+        if c is not None:
+            c[2] += 1; c[3] = j
+    pairs = sorted((c[1], c[3]) for c in count.values() if c[0] == 1 and c[2] == 1)
+    if not pairs:
+        return []
+    # longest increasing subsequence on j (patience sorting)
+    tails, tail_idx, prev = [], [], [-1] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j); tail_idx.append(n)
+        else:
+            tails[k] = j; tail_idx[k] = n
+        prev[n] = tail_idx[k - 1] if k else -1
+    chain = []
+    n = tail_idx[-1]
+    while n >= 0:
+        chain.append(pairs[n]); n = prev[n]
+    chain.reverse()
+    return chain
+
+def patience_matches(a, b):
+    """Matched (i, j) pairs: unique-item anchors recursively, Myers between them."""
+    out = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        alo, ahi, blo, bhi = _trim(a, alo, ahi, b, blo, bhi, out)
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if not anchors:
+            myers_matches(a, b, alo, ahi, blo, bhi, out)
+            continue
+        i0, j0 = alo, blo
+        for i, j in anchors:
+            out.append((i, j))
+            stack.append((i0, i, j0, j))
+            i0, j0 = i + 1, j + 1
+        stack.append((i0, ahi, j0, bhi))
+    return out
+
+# ---------------- opcodes ----------------
+def matching_blocks(pairs, n, m):
+    """Matched pairs -> difflib-style [(i, j, size)] ending with (n, m, 0)."""
+    blocks = []
+    for i, j in sorted(pairs):
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1][2] += 1
+        else:
+            blocks.append([i, j, 1])
+    return [tuple(x) for x in blocks] + [(n, m, 0)]
+
+def opcodes_from_blocks(blocks):
+    """Same construction as SequenceMatcher.get_opcodes()."""
+    i = j = 0
+    out = []
+    for ai, bj, size in blocks:
+        tag = ""
+        if i < ai and j < bj:
+            tag = "replace"
+        elif i < ai:
+            tag = "delete"
+        elif j < bj:
+            tag = "insert"
+        if tag:
+            out.append((tag, i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            out.append(("equal", ai, i, bj, j))
+    return out
+
+def get_opcodes(a, b, engine=None):
+    """difflib-compatible opcodes aligning sequences a and b (items must be hashable)."""
+    engine = engine or ENGINE
+    if engine == "difflib":
+        return SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+    ia, ib = intern_pair(a, b)
+    if engine == "patience":
+        pairs = patience_matches(ia, ib)
+    elif engine == "myers":
+        pairs = myers_matches(ia, ib)
+    else:
+        raise ValueError(f"unknown alignment engine: {engine!r}")
+    return opcodes_from_blocks(matching_blocks(pairs, len(a), len(b)))
+
+# ---------------- benchmark ----------------
+BOILERPLATE = [
+    "p:notwithstanding anything to the contrary herein.",
+    "p:this section intentionally left blank.",
+    "p:",
+    "p:[signature page follows]",
+    "tbl:party | signature | date",
+]
+
+def synthetic_pair(blocks=20000, edit_rate=0.02, boiler_rate=0.3, seed=1):
+    """Signature lists of a long contract and a revision of it: a boiler_rate share of
+    repeated boilerplate blocks, edit_rate of blocks changed / deleted / inserted."""
+    rnd = random.Random(seed)
+    base = [rnd.choice(BOILERPLATE) if rnd.random() < boiler_rate else f"p:clause {k} text {rnd.random():.6f}"
+            for k in range(blocks)]
+    rev = []
+    for k, s in enumerate(base):
+        r = rnd.random()
+        if r < edit_rate / 3:
+            continue                                   # deleted
+        if r < 2 * edit_rate / 3:
+            rev.append(s + " amended")                 # changed
+        else:
+            rev.append(s)
+        if rnd.random() < edit_rate / 3:
+            rev.append(rnd.choice(BOILERPLATE) if rnd.random() < 0.5 else f"p:new clause {k}")
+    return base, rev
+
+def bench(sizes=(2000, 10000, 40000), engines=("difflib", "myers", "patience"), timeout=120.0):
+    """Seconds per engine per size ({size: {engine: secs}}); engines slower than timeout
+    at one size are skipped at the larger ones."""
+    out = {}; slow = set()
+    for n in sizes:
+        a, b = synthetic_pair(n)
+        out[n] = {}
+        for e in engines:
+            if e in slow:
+                continue
+            t0 = time.perf_counter()
+            ops = get_opcodes(a, b, e)
+            secs = time.perf_counter() - t0
+            out[n][e] = round(secs, 3)
+            changed = sum(max(i2 - i1, j2 - j1) for t, i1, i2, j1, j2 in ops if t != "equal")
+            print(f"{n:>7} blocks  {e:<9} {secs:>8.3f}s  {len(ops):>6} opcodes  {changed:>6} blocks changed")
+            if secs > timeout:
+                slow.add(e)
+    return out
+
+if __name__ == "__main__":
+    bench()
@@ -6,11 +6,16 @@ Scan ./proc, ./jcl, ./sas and create:
   - procs_index.csv
   - jcl_index.csv
   - sas_index.csv
+Members are scanned in a process pool (JOBS) and their rows streamed to the CSV
+writers in sorted path order, so output is deterministic and only a small window
+of members is held in memory. JCL continuation lines (statement ending in ','
+followed by '//  ...') are joined, so DSN= on the next line is captured.
 No CLI; edit paths below if needed.
 """
 
-import os, re, io, csv, glob
-from collections import defaultdict
+import os, re, io, csv, glob, time
+
+import runreport
 
 BASE      = os.getcwd()
 PROC_DIR  = os.path.join(BASE, "proc")
@@ -21,68 +26,101 @@ OUT_PROCS = os.path.join(BASE, "procs_index.csv")
 OUT_JCL   = os.path.join(BASE, "jcl_index.csv")
 OUT_SAS   = os.path.join(BASE, "sas_index.csv")
 
+JOBS      = 1            # worker processes (0 = one per CPU)
+CHUNK     = 64           # members per worker task
+WINDOW    = 4            # tasks in flight per worker (bounds buffered rows)
+PROFILE   = False        # True -> per-phase timings/counters in REPORT_JSON
+REPORT_JSON = os.path.join(BASE, "buildindex_report.json")
+
+JCL_EXTS  = (".JCL",".PROC",".PRC",".CNTL",".CNTLJCL",".TXT")
+SAS_EXTS  = (".SAS",".TXT",".INC",".SRC",".PGM",".JOB")
+
+JCL_FIELDS = ["file","line","step","exec","ddname","dsn","disp","recfm","lrecl","blksize","raw"]
+SAS_FIELDS = ["file","line","data_step","kind","handle_or_ds","raw"]
+
 IDENT = r"[A-Z0-9][A-Z0-9\-_]*"
 
-def read_text(p): 
-    with io.open(p, "r", encoding="utf-8", errors="ignore") as f: 
+PROF = runreport.NULL    # replaced by a RunReport in main() when PROFILE
+
+def read_text(p):
+    with io.open(p, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
 
 def lines(p):
     for i, raw in enumerate(read_text(p).splitlines(), 1):
         yield i, raw.rstrip("\n")
 
-def norm(s): 
-    import re
+def norm(s):
     return re.sub(r"\s+","",s.upper()) if isinstance(s,str) else s
 
+RE_KV     = [(key, re.compile(rf"\b{key}\s*=\s*([^,]+)", re.I)) for key in ["DSN","DISP","UNIT","SPACE","VOL"]]
+RE_DCB    = re.compile(r"DCB\s*=\s*\(([^)]*)\)", re.I)
+RE_DCB_KV = [(key, re.compile(rf"\b{key}\s*=\s*([A-Z0-9]+)", re.I)) for key in ["RECFM","LRECL","BLKSIZE"]]
+
 def kv_from_dd_tail(tail: str) -> dict:
     d = {}
-    for key in ["DSN","DISP","UNIT","SPACE","VOL"]:
-        m = re.search(rf"\b{key}\s*=\s*([^,]+)", tail, re.I)
+    for key, rx in RE_KV:
+        m = rx.search(tail)
         if m: d[key] = m.group(1).strip()
-    m = re.search(r"DCB\s*=\s*\(([^)]*)\)", tail, re.I)
+    m = RE_DCB.search(tail)
     if m:
         dcb = m.group(1)
-        for key in ["RECFM","LRECL","BLKSIZE"]:
-            m2 = re.search(rf"\b{key}\s*=\s*([A-Z0-9]+)", dcb, re.I)
+        for key, rx in RE_DCB_KV:
+            m2 = rx.search(dcb)
             if m2: d[key] = m2.group(1)
     return d
 
-RE_EXEC = re.compile(rf"^\s*//({IDENT})?\s*EXEC\b\s+([A-Z0-9=,()]+)", re.I)
-RE_DD   = re.compile(rf"^\s*//({IDENT})\s+DD\b\s+(.*)$", re.I)
+RE_EXEC    = re.compile(rf"^\s*//({IDENT})?\s*EXEC\b\s+([A-Z0-9=,()]+)", re.I)
+RE_DD      = re.compile(rf"^\s*//({IDENT})\s+DD\b\s+(.*)$", re.I)
+RE_DD_QUAL = re.compile(rf"^\s*//({IDENT}\.{IDENT})\s+DD\b\s+(.*)$", re.I)  # //PROCSTEP.DD override
+RE_CONT    = re.compile(r"^\s*//\s+(\S.*)$")                  # '//' + blank name field
+RE_OPERAND = re.compile(r"^\s*((?:'[^']*'|[^\s'])+)")         # operand field (up to comments)
+
+def operand(text: str) -> str:
+    m = RE_OPERAND.match(text)
+    return m.group(1) if m else ""
 
-def index_jcl_like(src_dir: str, out_csv: str):
+# ---------------- per-member scanners (run in workers) ----------------
+def scan_jcl_member(path, steps=False):
+    """DD rows of one JCL/PROC member, as lists in JCL_FIELDS order.
+    steps=True adds a row with an empty ddname for every EXEC and keeps PROCSTEP.DD
+    override statements (ddname 'PROCSTEP.DD'); the index CSVs are written without them."""
     rows = []
-    for path in glob.glob(os.path.join(src_dir,"**/*"), recursive=True):
-        if not (os.path.isfile(path) and path.upper().endswith((".JCL",".PROC",".PRC",".CNTL",".CNTLJCL",".TXT"))):
+    src = list(lines(path))
+    step=""; execspec=""
+    i = 0
+    while i < len(src):
+        ln, line = src[i]; i += 1
+        if line.strip().startswith("//*"):
             continue
-        step=""; execspec=""
-        for ln, line in lines(path):
-            if line.strip().startswith("//*"):
-                continue
-            m = RE_EXEC.match(line)
-            if m:
-                step = (m.group(1) or "").upper()
-                execspec = m.group(2).upper()
-                continue
-            m = RE_DD.match(line)
-            if m:
-                dd = m.group(1).upper()
-                tail = m.group(2)
+        m = RE_EXEC.match(line)
+        if m:
+            step = (m.group(1) or "").upper()
+            execspec = m.group(2).upper()
+            if steps:
+                rows.append([path, ln, step, execspec, "", "", "", "", "", "", line.strip()])
+            continue
+        m = RE_DD.match(line) or (RE_DD_QUAL.match(line) if steps else None)
+        if m:
+            dd = m.group(1).upper()
+            tail = m.group(2)
+            op = operand(tail)
+            if op.endswith(","):
+                # continued statement: operands of the following '//  ...' lines
+                raw = [tail.strip()]
+                while op.endswith(",") and i < len(src):
+                    c = RE_CONT.match(src[i][1])
+                    if not c or src[i][1].lstrip().startswith("//*"):
+                        break
+                    raw.append(c.group(1).strip())
+                    op += operand(c.group(1)); i += 1
+                kv = kv_from_dd_tail(op)
+                tail = " ".join(raw)
+            else:
                 kv = kv_from_dd_tail(tail)
-                rows.append({
-                    "file": path, "line": ln, "step": step, "exec": execspec,
-                    "ddname": dd,
-                    "dsn": kv.get("DSN",""),
-                    "disp": kv.get("DISP",""),
-                    "recfm": kv.get("RECFM",""),
-                    "lrecl": kv.get("LRECL",""),
-                    "blksize": kv.get("BLKSIZE",""),
-                    "raw": tail.strip()
-                })
-    with io.open(out_csv,"w",newline="",encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["file","line","step","exec","ddname","dsn","disp","recfm","lrecl","blksize","raw"])
-        w.writeheader(); [w.writerow(r) for r in rows]
+            rows.append([path, ln, step, execspec, dd,
+                         kv.get("DSN",""), kv.get("DISP",""), kv.get("RECFM",""),
+                         kv.get("LRECL",""), kv.get("BLKSIZE",""), tail.strip()])
     return rows
 
 RE_DATA   = re.compile(r"\bDATA\s+([A-Z0-9_]+)\s*;", re.I)
@@ -90,46 +128,116 @@ RE_INFILE = re.compile(r"\bINFILE\s+([A-Z0-9_]+)\b.*?;", re.I)
 RE_FILE   = re.compile(r"\bFILE\s+([A-Z0-9_]+)\b.*?;", re.I)
 RE_MERGE  = re.compile(r"\bMERGE\s+(.+?);", re.I)
 RE_SET    = re.compile(r"\bSET\s+(.+?);", re.I)
+RE_WS     = re.compile(r"\s+")
 
-def index_sas(src_dir: str, out_csv: str):
+def scan_sas_member(path):
+    """INFILE/FILE/MERGE/SET rows of one SAS member, as lists in SAS_FIELDS order."""
     rows = []
-    for path in glob.glob(os.path.join(src_dir,"**/*"), recursive=True):
-        if not (os.path.isfile(path) and path.upper().endswith((".SAS",".TXT",".INC",".SRC",".PGM",".JOB"))):
-            continue
-        cur_data = ""
-        for ln, line in lines(path):
-            m = RE_DATA.search(line); 
-            if m: cur_data = m.group(1).upper()
-            for rx, kind in ((RE_INFILE,"INFILE"), (RE_FILE,"FILE")):
-                mm = rx.search(line)
-                if mm:
-                    rows.append({"file":path,"line":ln,"data_step":cur_data,"kind":kind,
-                                 "handle_or_ds":mm.group(1).upper(),"raw":line.strip()})
-            mm = RE_MERGE.search(line)
+    cur_data = ""
+    for ln, line in lines(path):
+        m = RE_DATA.search(line);
+        if m: cur_data = m.group(1).upper()
+        for rx, kind in ((RE_INFILE,"INFILE"), (RE_FILE,"FILE")):
+            mm = rx.search(line)
             if mm:
-                toks = [t for t in re.split(r"\s+", mm.group(1).strip()) if t and t.upper()!="BY"]
-                for t in toks:
-                    rows.append({"file":path,"line":ln,"data_step":cur_data,"kind":"MERGE",
-                                 "handle_or_ds":t.upper().rstrip(";"),"raw":line.strip()})
-            mm = RE_SET.search(line)
-            if mm:
-                toks = [t for t in re.split(r"\s+", mm.group(1).strip()) if t]
-                for t in toks:
-                    rows.append({"file":path,"line":ln,"data_step":cur_data,"kind":"SET",
-                                 "handle_or_ds":t.upper().rstrip(";"),"raw":line.strip()})
-    with io.open(out_csv,"w",newline="",encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["file","line","data_step","kind","handle_or_ds","raw"])
-        w.writeheader(); [w.writerow(r) for r in rows]
+                rows.append([path, ln, cur_data, kind, mm.group(1).upper(), line.strip()])
+        mm = RE_MERGE.search(line)
+        if mm:
+            toks = [t for t in RE_WS.split(mm.group(1).strip()) if t and t.upper()!="BY"]
+            for t in toks:
+                rows.append([path, ln, cur_data, "MERGE", t.upper().rstrip(";"), line.strip()])
+        mm = RE_SET.search(line)
+        if mm:
+            toks = [t for t in RE_WS.split(mm.group(1).strip()) if t]
+            for t in toks:
+                rows.append([path, ln, cur_data, "SET", t.upper().rstrip(";"), line.strip()])
     return rows
 
+SCANNERS = {"jcl": scan_jcl_member, "sas": scan_sas_member}
+
+def _scan_chunk(job):
+    """(kind, paths, timed) -> (rows, [(path, seconds)] when timed else [])."""
+    kind, paths, timed = job
+    scan = SCANNERS[kind]
+    out = []; times = []
+    if not timed:
+        for p in paths:
+            out.extend(scan(p))
+        return out, times
+    for p in paths:
+        t0 = time.perf_counter()
+        out.extend(scan(p))
+        times.append((p, time.perf_counter() - t0))
+    return out, times
+
+# ---------------- driver ----------------
+def list_members(src_dir, exts):
+    return sorted(p for p in glob.glob(os.path.join(src_dir,"**/*"), recursive=True)
+                  if os.path.isfile(p) and p.upper().endswith(exts))
+
+def iter_member_rows(kind, paths, n_workers=JOBS):
+    """Yield (rows, file times) chunk by chunk in path order; at most WINDOW chunks per worker in flight."""
+    n_workers = n_workers or os.cpu_count() or 1
+    jobs = [(kind, paths[i:i+CHUNK], PROF.enabled) for i in range(0, len(paths), CHUNK)]
+    if n_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _scan_chunk(job)
+        return
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=n_workers) as ex:
+        pending = deque()
+        it = iter(jobs)
+        for job in it:
+            pending.append(ex.submit(_scan_chunk, job))
+            if len(pending) >= n_workers * WINDOW:
+                break
+        while pending:
+            rows = pending.popleft().result()
+            for job in it:
+                pending.append(ex.submit(_scan_chunk, job)); break
+            yield rows
+
+def write_index(kind, src_dir, exts, out_csv, fields, n_workers=JOBS):
+    """Stream one directory's rows into out_csv; returns (members, rows)."""
+    with PROF.phase(f"list.{kind}"):
+        paths = list_members(src_dir, exts)
+    n = 0
+    with PROF.phase(f"scan+write.{kind}"), io.open(out_csv,"w",newline="",encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(fields)
+        for rows, times in iter_member_rows(kind, paths, n_workers):
+            w.writerows(rows); n += len(rows)
+            for p, secs in times:
+                PROF.file_time(p, secs)
+            if times:
+                PROF.add_time(f"member_scan.{kind}", sum(t for _, t in times), calls=len(times))
+    PROF.add(f"members.{kind}", len(paths)); PROF.add(f"rows.{kind}", n)
+    return len(paths), n
+
+def index_jcl_like(src_dir: str, out_csv: str, n_workers=JOBS):
+    return write_index("jcl", src_dir, JCL_EXTS, out_csv, JCL_FIELDS, n_workers)
+
+def index_sas(src_dir: str, out_csv: str, n_workers=JOBS):
+    return write_index("sas", src_dir, SAS_EXTS, out_csv, SAS_FIELDS, n_workers)
+
 def main():
+    global PROF
+    PROF = runreport.start("buildindex", PROFILE)
     os.makedirs(PROC_DIR, exist_ok=True)
     os.makedirs(JCL_DIR, exist_ok=True)
     os.makedirs(SAS_DIR, exist_ok=True)
+    t0 = time.perf_counter()
     procs = index_jcl_like(PROC_DIR, OUT_PROCS)
     jcls  = index_jcl_like(JCL_DIR, OUT_JCL)
     sas   = index_sas(SAS_DIR, OUT_SAS)
-    print(f"Wrote {OUT_PROCS} ({len(procs)} rows), {OUT_JCL} ({len(jcls)}), {OUT_SAS} ({len(sas)})")
+    dt = time.perf_counter() - t0
+    members = procs[0] + jcls[0] + sas[0]
+    print(f"Wrote {OUT_PROCS} ({procs[1]} rows), {OUT_JCL} ({jcls[1]}), {OUT_SAS} ({sas[1]})")
+    print(f"{members} members in {dt:.1f}s ({members / dt if dt else 0:.0f} members/s)")
+    if PROF.enabled:
+        PROF.note(jobs=JOBS, chunk=CHUNK, window=WINDOW)
+        print(f"Wrote {PROF.write(REPORT_JSON)}")
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-COBOL backtracker indexer — variables.csv builder (no copybooks).
+COBOL backtracker indexer — variables.csv builder.
 
 - Put COBOL files under ./cobol ( .cbl / .cob / .txt )
 - Writes variables.csv with columns:
@@ -10,22 +10,56 @@ COBOL backtracker indexer — variables.csv builder (no copybooks).
 Fixes:
 - Robust SELECT ... ASSIGN TO <DDNAME>. parser (stops at '.' or next clause keyword).
 - Defensive cleanup of assign/from_dd tokens to single identifiers.
+
+Incremental runs:
+- Each file is scanned into its own partial Store ("shard") which is cached under
+  ./.cobolindex together with a manifest of path, size, mtime and content hash.
+- A rerun only rescans new/changed files, drops shards of deleted files, then merges
+  all shards (in path order) and runs the DD propagation once, so variables.csv is
+  identical to a cold run. Set INCREMENTAL = False to force a cold rebuild.
+- JOBS > 1 scans files in a process pool; each worker returns a self-contained shard.
+
+Copybooks: `COPY member.` inside the DATA DIVISION is expanded in place from
+copybookcache.py (items parsed once per content hash, nested COPYs inlined), so
+copybook fields get their parent records and DDs like inline declarations. The
+manifest remembers which members each file copied, nested ones included, and
+rescans the file when one of them changes.
+
+Memory: names are interned to ints and edges frozen into CSR arrays (lineagegraph.py).
+Also writes lineage.idx, the binary scoped graph the backtrace/query tools open via mmap;
+variables.csv stays as the export format.
 """
 
-import os, re, io, csv, glob
+import os, re, io, csv, glob, json, time, hashlib
+from array import array
 from collections import defaultdict, deque
 
+import runreport, copybookcache
+from lineagegraph import SymbolTable, CSR, build_scoped, write_index
+
 # ---------------- Config ----------------
 COBOL_DIR  = os.path.join(os.getcwd(), "cobol")
+COPYBOOK_DIR = os.path.join(os.getcwd(), "copybook")     # members for COPY expansion
+EXPAND_COPY = True               # False -> ignore COPY statements
 OUTPUT_CSV = os.path.join(os.getcwd(), "variables.csv")
+OUTPUT_INDEX = os.path.join(os.getcwd(), "lineage.idx")  # binary graph for backtrace/query tools
+CACHE_DIR  = os.path.join(os.getcwd(), ".cobolindex")   # manifest + per-file shards
+INCREMENTAL = True               # False -> ignore the cache and rescan every file
+JOBS       = 1                   # worker processes for scanning (0 = one per CPU)
 QUERY      = ""                  # e.g., "ALS-BOOKING-DATE" (leave "" to skip print)
+PROFILE    = False               # True -> per-phase timings/counters in REPORT_JSON
+REPORT_JSON = os.path.join(os.getcwd(), "cobolindexer_report.json")
+
+MANIFEST_VERSION = 3
+
+PROF = runreport.NULL            # replaced by a RunReport in main() when PROFILE
+COPYBOOKS = None                 # CopybookCache used while scanning (None = no expansion)
 
 # ---------------- Helpers ----------------
 IDENT = r"[A-Z0-9][A-Z0-9\-]*"
 
 RE_DIVISION   = re.compile(r"\b(IDENTIFICATION|ENVIRONMENT|DATA|PROCEDURE)\s+DIVISION\b", re.I)
 RE_FD_OR_SD   = re.compile(r"^\s*(FD|SD)\s+(" + IDENT + r")\s*\.?", re.I)
-RE_01         = re.compile(r"^\s*01\s+(" + IDENT + r")\b", re.I)
 RE_LEVEL_ITEM = re.compile(r"^\s*(\d{2})\s+(" + IDENT + r")\b", re.I)
 
 # SELECT ... ASSIGN TO <ddname> (stop at '.' or next clause keyword)
@@ -42,6 +76,8 @@ RE_READ_INTO  = re.compile(r"\bREAD\s+(" + IDENT + r")\s+.*?\bINTO\s+(" + IDENT
 RE_MOVE_PAIR  = re.compile(r"\bMOVE\s+(" + IDENT + r")\s+TO\s+(" + IDENT + r")\b", re.I)
 RE_COMPUTE    = re.compile(r"\bCOMPUTE\s+(" + IDENT + r")\s*=\s*(.+?)\.", re.I | re.DOTALL)
 
+RE_IDENT      = re.compile(IDENT, re.I)
+
 # identifier token (defensive cleanup)
 RE_TOK        = re.compile(r"[A-Z0-9$#@-]+", re.I)
 
@@ -52,32 +88,16 @@ def read_text(p):
     with io.open(p, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
 
+def read_bytes(p):
+    with io.open(p, "rb") as f:
+        return f.read()
+
 def is_comment(line: str) -> bool:
     if not line: return False
     if len(line) >= 7 and line[6] in ("*", "/"): return True
     if line.lstrip().startswith("*"): return True
     return False
 
-def strip_inline(line: str) -> str:
-    # remove inline comments like *> ...
-    return re.sub(r"\*>.*$", "", line)
-
-def ids_in(text: str):
-    return set(norm(x) for x in re.findall(IDENT, text or "", re.I))
-
-def sentences(text: str):
-    """Join lines into 'sentences' ending with a period (.) for simple statement parsing."""
-    buf = []
-    for raw in text.splitlines():
-        line = strip_inline(raw.rstrip("\n"))
-        if not line.strip() or is_comment(line):
-            continue
-        buf.append(line.rstrip())
-        if line.strip().endswith('.'):
-            yield " ".join(buf); buf = []
-    if buf:
-        yield " ".join(buf)
-
 def tok_only(s: str) -> str:
     """Return the first identifier-like token (sanitizes garbage like LONCTXFILESTATUS...)"""
     if not s: return ""
@@ -86,277 +106,599 @@ def tok_only(s: str) -> str:
 
 # ---------------- Store ----------------
 class Store:
+    """
+    Lineage store keyed by interned ints (see lineagegraph.py):
+      vars / files / dds           SymbolTable: name <-> id
+      file_of, line_of, parent     array('i') per var id (parent -1 = none)
+      from_dd, assign_target       per var id: None or set of dd ids (filled by propagate_dd)
+      dep_t/dep_s, child_p/child_c (target, source) / (parent, child) pairs while scanning;
+                                   freeze() turns them into CSR: deps (target -> sources)
+                                   and children (parent -> children)
+      record_to_dd                 record/buffer id -> dd id (first binding wins)
+      dd_assign                    dd id -> ASSIGN literal dd id
+      select_map                   SELECT handle -> ASSIGN ddname (names)
+      copies                       copybook members expanded while scanning (nested too)
+    """
     def __init__(self):
+        self.vars  = SymbolTable()
+        self.files = SymbolTable()
+        self.dds   = SymbolTable()
         # per variable
-        self.vars = defaultdict(lambda: {
-            "origin_file": None,
-            "defined_at": None,
-            "parent_record": None,
-            "from_dd": set(),
-            "assign_target": set(),
-        })
+        self.file_of = array("i")
+        self.line_of = array("i")
+        self.parent  = array("i")
+        self.from_dd = []
+        self.assign_target = []
         # relations
-        self.parent_of  = {}                  # child -> parent
-        self.children   = defaultdict(set)    # parent -> children
-        self.deps       = defaultdict(set)    # target -> {sources}
-        # record/buffer -> ddname
+        self.dep_t   = array("i"); self.dep_s   = array("i")
+        self.child_p = array("i"); self.child_c = array("i")
+        self.deps = self.children = None
         self.record_to_dd = {}
-        # ddname -> ASSIGN literal
         self.dd_assign    = {}
+        self.select_map   = {}
+        self.copies       = set()
 
     def ensure_var(self, name, file, line):
-        k = norm(name)
-        v = self.vars[k]
-        if v["origin_file"] is None: v["origin_file"] = file
-        if v["defined_at"] is None:  v["defined_at"] = (file, line)
-        return k
-
-    def set_parent(self, child, parent):
-        c, p = norm(child), norm(parent)
-        self.parent_of[c] = p
-        self.children[p].add(c)
-        self.vars[c]["parent_record"] = p
-
-# ---------------- COBOL scan ----------------
-def extract_select_assign_pairs(cobol_text: str) -> dict:
-    """
-    Returns { 'INPUT-FILE': 'IFILE', 'LONCTX-FILE': 'LONCTX', ... }
-    Consumes a SELECT clause until '.' and extracts ASSIGN TO <dd>.
-    """
-    pairs = {}
-    lines = cobol_text.splitlines()
-    in_select = False
-    cur_select = None
-    buf = []
-
-    for raw in lines:
-        line = raw.rstrip("\n")
-        m_sel = RE_SELECT.match(line)
-        if m_sel:
-            # flush previous (just in case)
-            if in_select and cur_select and buf:
-                chunk = " ".join(buf)
-                m_asg = RE_ASSIGNTO.search(chunk)
-                if m_asg:
-                    pairs[norm(cur_select)] = tok_only(m_asg.group(1))
-            # start new
-            in_select = True
-            cur_select = m_sel.group(1)
-            buf = [line]
-            if "." in line:
-                chunk = " ".join(buf)
-                m_asg = RE_ASSIGNTO.search(chunk)
-                if m_asg:
-                    pairs[norm(cur_select)] = tok_only(m_asg.group(1))
-                in_select = False
-                cur_select = None
-                buf = []
-            continue
-
-        if in_select:
-            buf.append(line)
-            if "." in line:
-                chunk = " ".join(buf)
-                m_asg = RE_ASSIGNTO.search(chunk)
-                if m_asg:
-                    pairs[norm(cur_select)] = tok_only(m_asg.group(1))
-                in_select = False
-                cur_select = None
-                buf = []
-
-    # safety flush
-    if in_select and cur_select and buf:
-        chunk = " ".join(buf)
-        m_asg = RE_ASSIGNTO.search(chunk)
-        if m_asg:
-            pairs[norm(cur_select)] = tok_only(m_asg.group(1))
-
-    return pairs
-
-def scan_file(path, store: Store):
-    text = read_text(path)
-
-    # PASS A: declarations in DATA DIVISION (ignore 88/FILLER)
-    current_div = None
-    current_dd  = None
-    current_01  = None
-    stack = []  # [(level, name)]
-
+        return self._ensure(norm(name), file, line)
+
+    def _ensure(self, k, file, line):
+        i = self.vars.ids.get(k)
+        if i is None:
+            i = self.vars.intern(k)
+            self.file_of.append(self.files.intern(file))
+            self.line_of.append(line)
+            self.parent.append(-1)
+            self.from_dd.append(None)
+            self.assign_target.append(None)
+        return i
+
+    def set_parent(self, c, p):
+        self.parent[c] = p
+        self.child_p.append(p); self.child_c.append(c)
+
+    def add_dep(self, t, s):
+        self.dep_t.append(t); self.dep_s.append(s)
+
+    def freeze(self):
+        n = len(self.vars)
+        self.deps     = CSR.from_pairs(n, self.dep_t, self.dep_s)
+        self.children = CSR.from_pairs(n, self.child_p, self.child_c)
+
+    def feed(self, path, events):
+        """Consume lex_cobol() events of one file."""
+        current_dd  = None
+        current_01  = None
+        stack = []  # [(level, var id)]
+        for ev in events:
+            kind = ev[0]
+            if kind == "LEVEL":
+                _, ln, lvl, name = ev
+                if lvl == 1:
+                    current_01 = self._ensure(name, path, ln)
+                    if current_dd is not None:
+                        self.record_to_dd.setdefault(current_01, current_dd)
+                    continue
+                if lvl == 88 or name == "FILLER":   # ignore 88/FILLER
+                    continue
+                v = self._ensure(name, path, ln)
+                while stack and stack[-1][0] >= lvl:
+                    stack.pop()
+                parent = stack[-1][1] if stack else current_01
+                if parent is not None:
+                    self.set_parent(v, parent)
+                stack.append((lvl, v))
+            elif kind == "MOVE":
+                s = self._ensure(ev[2], path, 0)
+                t = self._ensure(ev[3], path, 0)
+                self.add_dep(t, s)
+            elif kind == "COMPUTE":
+                # collect identifiers in expr as deps
+                t = self._ensure(ev[2], path, 0)
+                for x in {x.upper() for x in RE_IDENT.findall(ev[3])}:
+                    self.add_dep(t, self._ensure(x, path, 0))
+            elif kind == "READ_INTO":
+                ddn = tok_only(ev[2])
+                if ddn:
+                    b = self._ensure(ev[3], path, 0)
+                    self.record_to_dd.setdefault(b, self.dds.intern(ddn))
+            elif kind == "FD":
+                current_dd = self.dds.intern(ev[2])
+                current_01 = None
+                stack = []
+            elif kind == "DIVISION":
+                if ev[2] == "DATA":
+                    current_dd = None; current_01 = None; stack = []
+            elif kind == "SELECT":
+                # Tie SELECT handle to ASSIGN ddname; dd_assign keeps the clean DD literal
+                # so backtrace can show "ASSIGN:<dd>"
+                _, _, handle, dd = ev
+                self.select_map[handle] = dd
+                d = self.dds.intern(dd)
+                self.dd_assign[d] = d
+            elif kind == "COPY":
+                self.copies.add(ev[2])
+
+    # ---- shards (one partial Store per scanned file) ----
+    def to_dict(self):
+        """Serialize a single-file shard by name; origin_file is the shard's path for every var."""
+        names, dds = self.vars.names, self.dds.names
+        children, deps = defaultdict(set), defaultdict(set)
+        for p, c in zip(self.child_p, self.child_c):
+            children[names[p]].add(names[c])
+        for t, s in zip(self.dep_t, self.dep_s):
+            deps[names[t]].add(names[s])
+        return {
+            "vars":         [[k, self.line_of[i]] for i, k in enumerate(names)],
+            "parent_of":    [[names[c], names[p]] for c, p in enumerate(self.parent) if p >= 0],
+            "children":     {p: sorted(ch) for p, ch in children.items()},
+            "deps":         {t: sorted(srcs) for t, srcs in deps.items()},
+            "record_to_dd": [[names[r], dds[d]] for r, d in self.record_to_dd.items()],
+            "dd_assign":    {dds[d]: dds[a] for d, a in self.dd_assign.items()},
+            "select_map":   self.select_map,
+            "copies":       sorted(self.copies),
+        }
+
+    @classmethod
+    def from_dict(cls, path, d):
+        st = cls()
+        for k, line in d["vars"]:
+            st._ensure(k, path, line)
+        ids = st.vars.ids
+        for c, p in d["parent_of"]:
+            st.parent[ids[c]] = ids[p]
+        for p, ch in d["children"].items():
+            for c in ch:
+                st.child_p.append(ids[p]); st.child_c.append(ids[c])
+        for t, srcs in d["deps"].items():
+            for s in srcs:
+                st.add_dep(ids[t], ids[s])
+        for r, dd in d["record_to_dd"]:
+            st.record_to_dd.setdefault(ids[r], st.dds.intern(dd))
+        for dd, at in d["dd_assign"].items():
+            st.dd_assign[st.dds.intern(dd)] = st.dds.intern(at)
+        st.select_map.update(d["select_map"])
+        st.copies.update(d.get("copies", ()))
+        return st
+
+    def merge(self, shard):
+        """Fold a shard in; same first-wins / last-wins rules as scanning the files in order."""
+        files = shard.files.names
+        vmap = array("i", (self._ensure(k, files[shard.file_of[i]], shard.line_of[i])
+                           for i, k in enumerate(shard.vars.names)))
+        dmap = array("i", (self.dds.intern(x) for x in shard.dds.names))
+        for c, p in enumerate(shard.parent):
+            if p >= 0:
+                self.parent[vmap[c]] = vmap[p]
+        self.child_p.extend(vmap[p] for p in shard.child_p)
+        self.child_c.extend(vmap[c] for c in shard.child_c)
+        self.dep_t.extend(vmap[t] for t in shard.dep_t)
+        self.dep_s.extend(vmap[s] for s in shard.dep_s)
+        for r, d in shard.record_to_dd.items():
+            self.record_to_dd.setdefault(vmap[r], dmap[d])
+        for d, a in shard.dd_assign.items():
+            self.dd_assign[dmap[d]] = dmap[a]
+        self.select_map.update(shard.select_map)
+
+# ---------------- COBOL lexer ----------------
+# One streaming walk per file. Each non-comment line is cleaned once and feeds three
+# consumers at the same time: DATA DIVISION declarations, SELECT clauses and the
+# sentence buffer (lines joined up to a terminating '.'). Events are tuples:
+#   ("DIVISION",  ln, name)
+#   ("FD",        ln, ddname)                FD or SD
+#   ("LEVEL",     ln, level, name)           any level item inside DATA DIVISION
+#   ("SELECT",    ln, handle, ddname)        SELECT ... ASSIGN TO ddname
+#   ("READ_INTO", ln, dd, buffer)
+#   ("MOVE",      ln, source, target)
+#   ("COMPUTE",   ln, target, expression)
+#   ("COPY",      ln, member)                one per member of the COPY's nesting closure,
+#                                            followed by the expanded LEVEL events
+# ln is the (1-based) line where the declaration/clause/sentence ends. Names are
+# IDENT matches, so upper() already gives the norm() form.
+RE_VERBS = re.compile(r"\b(READ|MOVE|COMPUTE)\b", re.I)
+
+def lex_cobol(text: str, copybooks=None):
+    div = None
+    sel = None          # [handle, [lines]] while inside a SELECT clause
+    buf = []            # current sentence
+    ln = 0
     for ln, raw in enumerate(text.splitlines(), 1):
-        line = strip_inline(raw.rstrip("\n"))
-        if not line.strip() or is_comment(line):
+        cut = raw.find("*>")
+        line = raw[:cut] if cut >= 0 else raw
+        stripped = line.strip()
+        if not stripped or is_comment(line):
             continue
 
+        # --- declarations ---
         m = RE_DIVISION.search(line)
         if m:
-            current_div = m.group(1).upper()
-            if current_div == "DATA":
-                current_dd = None; current_01 = None; stack = []
-            continue
-
-        m = RE_FD_OR_SD.match(line)
-        if m and current_div == "DATA":
-            current_dd = norm(m.group(2))
-            current_01 = None
-            stack = []
-            continue
-
-        m = RE_01.match(line)
-        if m and current_div == "DATA":
-            current_01 = norm(m.group(1))
-            store.ensure_var(current_01, path, ln)
-            if current_dd:
-                store.record_to_dd.setdefault(current_01, current_dd)
-            continue
-
-        m = RE_LEVEL_ITEM.match(line)
-        if m and current_div == "DATA":
-            lvl = int(m.group(1)); name = norm(m.group(2))
-            if lvl == 88 or name == "FILLER":
-                continue
-            store.ensure_var(name, path, ln)
-            while stack and stack[-1][0] >= lvl:
-                stack.pop()
-            parent = stack[-1][1] if stack else current_01
-            if parent:
-                store.set_parent(name, parent)
-            stack.append((lvl, name))
-            continue
+            div = m.group(1).upper()
+            yield ("DIVISION", ln, div)
+        elif div == "DATA":
+            m = RE_FD_OR_SD.match(line)
+            if m:
+                yield ("FD", ln, m.group(2).upper())
+            elif stripped[0].isdigit():
+                m = RE_LEVEL_ITEM.match(line)
+                if m:
+                    yield ("LEVEL", ln, int(m.group(1)), m.group(2).upper())
+            elif copybooks is not None and stripped[:4].upper() == "COPY":
+                m = copybookcache.RE_COPY.match(line)
+                if m:
+                    member = m.group(1).upper()
+                    for dep in copybooks.closure(member):
+                        yield ("COPY", ln, dep)
+                    for _, lvl, name, _, _ in copybooks.expand(member) or ():
+                        yield ("LEVEL", ln, lvl, name)
+
+        # --- SELECT ... ASSIGN TO ... (clause runs until a line containing '.') ---
+        m = RE_SELECT.match(line) if stripped[:6].upper() == "SELECT" else None
+        if m:
+            if sel:
+                yield from _select_event(ln, sel)
+            sel = [m.group(1), [line]]
+        elif sel:
+            sel[1].append(line)
+        if sel and "." in line:
+            yield from _select_event(ln, sel)
+            sel = None
+
+        # --- sentences ---
+        buf.append(line.rstrip())
+        if stripped.endswith("."):
+            yield from _sentence_events(ln, " ".join(buf))
+            buf = []
 
-    # PASS B: procedural statements (sentences ending '.')
-    # 1) SELECT ... ASSIGN TO ...
-    select_map = extract_select_assign_pairs(text)  # e.g., {'LONCTX-FILE':'LONCTX', 'INPUT-FILE':'IFILE'}
-    # map record/buffer to the DD via its SELECT handle when possible
-    # (we keep using READ ... INTO to bind buffers to DDs)
-    for sent in sentences(text):
-        # READ <dd> INTO <buffer>
-        for dd, buf in RE_READ_INTO.findall(sent):
-            ddn = tok_only(norm(dd))
-            if ddn:
-                b = norm(buf)
-                store.ensure_var(b, path, 0)
-                store.record_to_dd.setdefault(b, ddn)
-
-        # MOVE src TO tgt
+    if sel:
+        yield from _select_event(ln, sel)
+    if buf:
+        yield from _sentence_events(ln, " ".join(buf))
+
+def _select_event(ln, sel):
+    m = RE_ASSIGNTO.search(" ".join(sel[1]))
+    if m:
+        yield ("SELECT", ln, sel[0].upper(), tok_only(m.group(1)))
+
+def _sentence_events(ln, sent):
+    verbs = {v.upper() for v in RE_VERBS.findall(sent)}
+    if not verbs:
+        return
+    if "READ" in verbs:
+        for dd, b in RE_READ_INTO.findall(sent):
+            yield ("READ_INTO", ln, dd.upper(), b.upper())
+    if "MOVE" in verbs:
         for src, tgt in RE_MOVE_PAIR.findall(sent):
-            s, t = norm(src), norm(tgt)
-            store.ensure_var(s, path, 0)
-            store.ensure_var(t, path, 0)
-            store.deps[t].add(s)
-
-        # COMPUTE tgt = expr ... (collect identifiers in expr as deps)
+            yield ("MOVE", ln, src.upper(), tgt.upper())
+    if "COMPUTE" in verbs:
         mc = RE_COMPUTE.search(sent)
         if mc:
-            tgt = norm(mc.group(1))
-            srcs = ids_in(mc.group(2))
-            store.ensure_var(tgt, path, 0)
-            for s in srcs:
-                store.ensure_var(s, path, 0)
-                store.deps[tgt].add(s)
-
-    # Tie SELECT handle to ASSIGN ddname for FILE-CONTROL
-    # (This is where we fix the over-capture: dd is already clean)
-    for handle, dd in select_map.items():
-        # Often handle is like LONCTX-FILE; we want the record from 01 xx under that FD
-        # We bind the 01 that used this FD in pass A via record_to_dd (already filled)
-        # Also store the ASSIGN value per DD, so backtrace can show "ASSIGN:<dd>"
-        store.dd_assign[dd] = dd  # we only need the DD literal (clean token)
-
-    # PASS C: propagate DD from any record/buffer down to its children
-    for rec, dd in list(store.record_to_dd.items()):
+            yield ("COMPUTE", ln, mc.group(1).upper(), mc.group(2))
+
+# ---------------- COBOL scan ----------------
+def scan_file(path, store: Store, text=None, copybooks=None):
+    """Declarations, SELECT/ASSIGN and statements of one file (DD propagation is global)."""
+    if text is None:
+        text = read_text(path)
+    store.feed(path, lex_cobol(text, copybooks))
+
+def propagate_dd(store: Store):
+    """PASS C: runs once over the merged Store (records/children from every file)."""
+    store.freeze()
+    from_dd, children = store.from_dd, store.children
+    # propagate DD from any record/buffer down to its children; children always holds
+    # the parent_of edge too, so a child ends up with every DD of its parent
+    for rec, dd in store.record_to_dd.items():
         q = deque([rec]); seen = {rec}
         while q:
             cur = q.popleft()
-            store.vars[cur]["from_dd"].add(dd)
-            for ch in store.children.get(cur, []):
+            s = from_dd[cur]
+            if s is None:
+                s = from_dd[cur] = set()
+            s.add(dd)
+            for ch in children.row(cur):
                 if ch not in seen:
                     seen.add(ch); q.append(ch)
 
-    # Inherit parent's DDs & attach ASSIGN (defensive token cleanup)
-    for v, meta in store.vars.items():
-        p = store.parent_of.get(v)
-        if p:
-            meta["parent_record"] = p
-            for dd in store.vars[p]["from_dd"]:
-                meta["from_dd"].add(tok_only(dd))
-        for dd in list(meta["from_dd"]):
-            at = store.dd_assign.get(dd)
-            if at:
-                meta["assign_target"].add(tok_only(at))
+    # attach ASSIGN
+    for v, dds in enumerate(from_dd):
+        if dds:
+            ats = {store.dd_assign[d] for d in dds if d in store.dd_assign}
+            if ats:
+                store.assign_target[v] = ats
+
+# ---------------- Incremental cache ----------------
+def list_cobol_files(root=COBOL_DIR):
+    return sorted(
+        p for p in glob.glob(os.path.join(root, "**/*"), recursive=True)
+        if os.path.isfile(p) and p.upper().endswith((".CBL",".COB",".TXT"))
+    )
+
+def shard_path(cache_dir, path):
+    return os.path.join(cache_dir, "shards", hashlib.sha1(path.encode("utf-8")).hexdigest() + ".json")
+
+def copybook_key(copybooks):
+    """Manifest tag for the COPY expansion setting (shards differ with/without it)."""
+    return os.path.abspath(copybooks.copy_dir) if copybooks is not None else ""
+
+def copies_current(ent, copybooks):
+    """True when every member a cached file copied still has the recorded content hash."""
+    return all(copybooks.digest(m) == h for m, h in ent.get("copies", {}).items())
+
+def load_manifest(cache_dir, copy_key=""):
+    p = os.path.join(cache_dir, "manifest.json")
+    if not os.path.exists(p):
+        return {}
+    try:
+        with io.open(p, "r", encoding="utf-8") as f:
+            d = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if d.get("version") != MANIFEST_VERSION or d.get("copybooks", "") != copy_key:
+        return {}
+    return d.get("files", {})
+
+def save_manifest(cache_dir, files, copy_key=""):
+    p = os.path.join(cache_dir, "manifest.json")
+    tmp = p + ".tmp"
+    with io.open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "copybooks": copy_key, "files": files},
+                  f, indent=1, sort_keys=True)
+    os.replace(tmp, p)
+
+def load_shard(cache_dir, path):
+    try:
+        with io.open(shard_path(cache_dir, path), "r", encoding="utf-8") as f:
+            return Store.from_dict(path, json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_shard(cache_dir, path, shard):
+    with io.open(shard_path(cache_dir, path), "w", encoding="utf-8") as f:
+        json.dump(shard.to_dict(), f, separators=(",", ":"))
+
+def scan_shard(path, data):
+    shard = Store()
+    scan_file(path, shard, data.decode("utf-8", errors="ignore"), COPYBOOKS)
+    return shard
+
+def _init_worker(copybooks):
+    global COPYBOOKS
+    COPYBOOKS = copybooks
+
+def _scan_job(job):
+    """
+    Worker: (path, cached_sha1, cache_dir) -> (sha1, shard dict or None, read_s, parse_s).
+    None means the content hash matched the cached shard, so nothing was scanned.
+    Runs in-process for JOBS == 1, otherwise inside the process pool.
+    """
+    path, cached_sha1, cache_dir = job
+    t0 = time.perf_counter()
+    data = read_bytes(path)
+    digest = hashlib.sha1(data).hexdigest()
+    t1 = time.perf_counter()
+    if cached_sha1 == digest:
+        return digest, None, t1 - t0, 0.0
+    shard = scan_shard(path, data)
+    if cache_dir:
+        save_shard(cache_dir, path, shard)
+    return digest, shard.to_dict(), t1 - t0, time.perf_counter() - t1
+
+def run_jobs(jobs, n_workers):
+    """Yield _scan_job results in input order (deterministic merge regardless of pool scheduling)."""
+    if n_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _scan_job(job)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    chunk = max(1, min(64, len(jobs) // (n_workers * 4)))
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(COPYBOOKS,)) as ex:
+        yield from ex.map(_scan_job, jobs, chunksize=chunk)
+
+def build_store(paths, cache_dir=None, n_workers=1, copybooks=None):
+    """
+    Merge per-file shards into one Store. With cache_dir, unchanged files (same size+mtime,
+    or same content hash) reuse their cached shard; others are rescanned and re-cached.
+    Scanning is spread over n_workers processes; shards are merged one at a time in path
+    order (only the merged Store stays resident) and PASS C runs once afterwards.
+    copybooks (a CopybookCache) enables COPY expansion; a file is also rescanned when
+    a member it copied has changed. Returns (store, number_of_rescanned_files).
+    """
+    global COPYBOOKS
+    COPYBOOKS = copybooks
+    copy_key = copybook_key(copybooks)
+    old = load_manifest(cache_dir, copy_key) if cache_dir else {}
+    if cache_dir:
+        os.makedirs(os.path.join(cache_dir, "shards"), exist_ok=True)
+    files = {}
+    jobs = []
+    for path in paths:
+        st = os.stat(path)
+        ent = old.get(path)
+        fresh = ent is not None and copies_current(ent, copybooks)
+        if fresh and ent["size"] == st.st_size and ent["mtime"] == st.st_mtime_ns:
+            files[path] = dict(ent)
+            continue
+        jobs.append((path, ent["sha1"] if fresh else None, cache_dir))
+        files[path] = {"size": st.st_size, "mtime": st.st_mtime_ns, "sha1": "",
+                       "copies": ent.get("copies", {}) if fresh else {}}
+
+    store = Store()
+    rescanned = 0
+    read_s = parse_s = 0.0
+    results = run_jobs(jobs, n_workers)
+    scanned = {job[0] for job in jobs}
+    for path in paths:
+        d = None
+        if path in scanned:
+            files[path]["sha1"], d, r_s, p_s = next(results)
+            read_s += r_s; parse_s += p_s
+            PROF.file_time(path, r_s + p_s)
+        shard = load_shard(cache_dir, path) if d is None else Store.from_dict(path, d)
+        if shard is None:   # cached shard missing/unreadable
+            files[path]["sha1"], d, r_s, p_s = _scan_job((path, None, cache_dir))
+            read_s += r_s; parse_s += p_s
+            shard = Store.from_dict(path, d)
+        if d is not None:
+            rescanned += 1
+            files[path]["copies"] = {m: copybooks.digest(m) for m in shard.copies} if copybooks else {}
+        store.merge(shard)
+    # worker-side time (summed over files; runs in parallel when JOBS > 1)
+    PROF.add_time("scan.read", read_s, calls=len(jobs))
+    PROF.add_time("scan.parse", parse_s, calls=rescanned)
+    PROF.add("files", len(paths)); PROF.add("files_rescanned", rescanned)
+
+    if cache_dir:
+        for gone in set(old) - set(files):
+            try:
+                os.remove(shard_path(cache_dir, gone))
+            except OSError:
+                pass
+        save_manifest(cache_dir, files, copy_key)
+
+    with PROF.phase("propagate_dd"):
+        propagate_dd(store)
+    if PROF.enabled:
+        PROF.add("variables", len(store.vars))
+        PROF.add("dep_edges", len(store.deps.targets))
+        PROF.add("child_edges", len(store.children.targets))
+        PROF.add("dd_links", sum(1 for x in store.from_dd if x))
+    return store, rescanned
 
 # ---------------- Backtrace (for quick check) ----------------
 def trace_chain(store: Store, varname: str, max_depth=50):
-    start = norm(varname)
-    if start not in store.vars:
+    v = store.vars.get(norm(varname))
+    if v < 0:
         return f"{varname}: not found"
-    q = deque([[start]])
-    seen_edges = set()
-    results = []
+    return trace_all(store, max_depth)[v] or f"{varname}: no DD/ASSIGN origin found"
 
-    def at_dd(v):
-        cur = v; hops = 0
-        while cur and hops <= 20:
-            if store.vars[cur]["from_dd"]:
-                dd = sorted(store.vars[cur]["from_dd"])[0]
-                at = store.dd_assign.get(dd, "")
-                return True, dd, at
-            cur = store.parent_of.get(cur); hops += 1
-        return False, "", ""
+def trace_all(store: Store, max_depth=50):
+    """
+    Shortest DD/ASSIGN route for every variable at once, in O(V+E); None where no
+    origin is reachable within max_depth hops.
+
+    A multi-source BFS over reversed deps edges, seeded with every origin (a var that
+    has a DD on itself or on an ancestor), gives each var its distance to the nearest
+    origin. Following, from a var, the alphabetically first dependency that is one step
+    closer yields the path a sorted level-order BFS from that var reports first, so only
+    one successor pointer per var is kept and the path is materialized when printed.
+    """
+    names, dds = store.vars.names, store.dds.names
+    n = len(names)
+    parent, from_dd, deps = store.parent, store.from_dd, store.deps
 
+    origin = {}
+    for v in range(n):
+        cur = v; hops = 0
+        while cur >= 0 and hops <= 20:
+            if from_dd[cur]:
+                d = min(from_dd[cur], key=dds.__getitem__)
+                at = store.dd_assign.get(d)
+                origin[v] = (dds[d], dds[at] if at is not None else "")
+                break
+            cur = parent[cur]; hops += 1
+
+    rdeps = deps.reverse()
+    dist = array("i", [-1]) * n
+    q = deque(origin)
+    for v in origin:
+        dist[v] = 0
     while q:
-        path = q.popleft()
-        cur = path[-1]
-        ok, dd, at = at_dd(cur)
-        if ok:
-            results.append((path, dd, at)); continue
-        if len(path) > max_depth:
+        cur = q.popleft()
+        d = dist[cur] + 1
+        if d > max_depth:
             continue
-        for s in sorted(store.deps.get(cur, set())):
-            e = (cur, s)
-            if e in seen_edges: 
-                continue
-            seen_edges.add(e)
-            q.append(path + [s])
-
-    if not results:
-        return f"{varname}: no DD/ASSIGN origin found"
-
-    # choose the shortest
-    path, dd, at = min(results, key=lambda r: len(r[0]))
-    return f"{' <- '.join(path)} (DD={dd}; ASSIGN={at})"
+        for t in rdeps.row(cur):
+            if dist[t] < 0:
+                dist[t] = d; q.append(t)
+
+    nxt = array("i", [-1]) * n
+    for v in range(n):
+        d = dist[v]
+        if d > 0:
+            nxt[v] = min((s for s in deps.row(v) if dist[s] == d - 1), key=names.__getitem__)
+
+    out = [None] * n
+    for v in range(n):
+        if dist[v] < 0:
+            continue
+        path = [v]
+        while nxt[path[-1]] >= 0:
+            path.append(nxt[path[-1]])
+        dd, at = origin[path[-1]]
+        out[v] = f"{' <- '.join(names[p] for p in path)} (DD={dd}; ASSIGN={at})"
+    return out
 
 # ---------------- CSV writer ----------------
 def write_csv(store: Store, out_path: str):
+    names, files, dds = store.vars.names, store.files.names, store.dds.names
     with io.open(out_path, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(["variable","origin_file","defined_at","parent_record","from_dd","assign_target","direct_sources","trace_to_input"])
-        for v, meta in sorted(store.vars.items()):
-            loc = f"{meta['defined_at'][1]}" if meta["defined_at"] else ""
-            dd  = ";".join(sorted(tok_only(x) for x in meta.get("from_dd", set()) if x))
-            at  = ";".join(sorted(tok_only(x) for x in meta.get("assign_target", set()) if x))
-            deps= ";".join(sorted(store.deps.get(v, set()))) or ""
-            trace = trace_chain(store, v) if (dd or deps) else ""
+        with PROF.phase("trace_all"):
+            traces = trace_all(store)
+        for v in sorted(range(len(names)), key=names.__getitem__):
+            p   = store.parent[v]
+            dd  = ";".join(sorted(tok_only(dds[x]) for x in store.from_dd[v] or ()))
+            at  = ";".join(sorted(tok_only(dds[x]) for x in store.assign_target[v] or ()))
+            deps= ";".join(sorted(names[s] for s in store.deps.row(v)))
+            trace = (traces[v] or f"{names[v]}: no DD/ASSIGN origin found") if (dd or deps) else ""
             w.writerow([
-                v,
-                meta.get("origin_file") or "",
-                loc,
-                meta.get("parent_record") or "",
+                names[v],
+                files[store.file_of[v]],
+                f"{store.line_of[v]}",
+                names[p] if p >= 0 else "",
                 dd,
                 at,
                 deps,
                 trace
             ])
 
+# ---------------- Binary index ----------------
+def store_rows(store: Store):
+    """The variables.csv rows (sorted, cleaned) as build_scoped() expects them."""
+    names, files, dds = store.vars.names, store.files.names, store.dds.names
+    for v in sorted(range(len(names)), key=names.__getitem__):
+        p = store.parent[v]
+        yield (
+            names[v],
+            files[store.file_of[v]],
+            names[p] if p >= 0 else "",
+            sorted(tok_only(dds[x]) for x in store.from_dd[v] or ()),
+            sorted(tok_only(dds[x]) for x in store.assign_target[v] or ()),
+            sorted(names[s] for s in store.deps.row(v)),
+        )
+
+def write_lineage_index(store: Store, out_path: str):
+    """Same scoped graph backtrace6 would build from variables.csv, as lineage.idx,
+    plus select_map (FD handle -> ASSIGN ddname) so JCL ddnames/DSNs find the handles."""
+    selects = ((tok_only(h), tok_only(dd)) for h, dd in sorted(store.select_map.items()))
+    write_index(build_scoped(store_rows(store), selects), out_path)
+
 # ---------------- Driver ----------------
 def main():
-    store = Store()
-    for path in glob.glob(os.path.join(COBOL_DIR, "**/*"), recursive=True):
-        if os.path.isfile(path) and path.upper().endswith((".CBL",".COB",".TXT")):
-            scan_file(path, store)
-    write_csv(store, OUTPUT_CSV)
-    print(f"Wrote {OUTPUT_CSV} with {len(store.vars)} variables.")
+    global PROF
+    PROF = runreport.start("cobolindexer", PROFILE)
+    with PROF.phase("list_files"):
+        paths = list_cobol_files()
+    copybooks = None
+    if EXPAND_COPY and os.path.isdir(COPYBOOK_DIR):
+        with PROF.phase("copybooks"):
+            copybooks = copybookcache.load(COPYBOOK_DIR)
+        PROF.add("copybooks", len(copybooks.paths)); PROF.add("copybooks_parsed", copybooks.reparsed)
+    with PROF.phase("build_store"):
+        store, rescanned = build_store(paths, CACHE_DIR if INCREMENTAL else None,
+                                       JOBS or os.cpu_count() or 1, copybooks)
+    with PROF.phase("write_csv"):
+        write_csv(store, OUTPUT_CSV)
+    with PROF.phase("write_index"):
+        write_lineage_index(store, OUTPUT_INDEX)
+    print(f"Scanned {rescanned} of {len(paths)} files (others from cache).")
+    print(f"Wrote {OUTPUT_CSV} and {OUTPUT_INDEX} with {len(store.vars)} variables.")
     if QUERY:
         print(trace_chain(store, QUERY))
+    if PROF.enabled:
+        PROF.note(jobs=JOBS, incremental=INCREMENTAL)
+        print(f"Wrote {PROF.write(REPORT_JSON)}")
 
 if __name__ == "__main__":
     main()
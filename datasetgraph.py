@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+datasetgraph.py — dataset-level lineage across jobs, with a precomputed reachability index
+- Joins variables.csv (program -> DDs its variables come from) with jcl_index.csv /
+  procs_index.csv / sas_index.csv (step -> DD -> DSN) into one graph whose edges point
+  upstream:
+      PGM:P       -> PGMDD:P.DD   (input DDs of the steps that run P)
+      PGMDD:P.DD  -> DSN:X        (X bound to DD in any step that runs P)
+      STEP:f#s    -> DSN:X        (step reads X; f#s.p for step p of a PROC called at s)
+      DSN:X       -> STEP:f#s     (step writes X)
+  Direction of a DD: SAS INFILE/FILE of the step's SYSIN member when known, else
+  DISP (NEW/MOD -> written, otherwise read). GDG generations collapse to the base,
+  &&temp datasets are scoped to their job file. A variable starts from the P.DD
+  nodes of its from_dd/assign_target, or from its program when none is bound in JCL;
+  FD/SELECT handles there (IN-FILE-1) become their ASSIGN ddnames (INDD1) through the
+  select table cobolindexer exports in lineage.idx.
+- A SAS step's program is its SYSIN member (PGM:SASM0001), not "SAS".
+- PROC calls are expanded per calling step: `//S1 EXEC MYPROC` becomes one node
+  STEP:job#S1.PROCSTEP per proc step, with the call's `//PROCSTEP.DD` overrides and
+  additions applied (unqualified DDs go to the first proc step) and &&temps scoped to
+  the calling job. Procs no job calls keep their own STEP:procfile#step nodes. One
+  level only: a proc step that itself calls a proc is kept as a plain step.
+  jcl_index.csv has DD rows only (no row for a DD-less PROC call, no overrides), so
+  ./jcl and ./proc are scanned here with buildindex's scanner in step mode; the CSVs
+  are the fallback when those folders are missing.
+- Reachability: SCCs are condensed (Tarjan); components are numbered in post-order,
+  so every component's upstream closure is a short list of post-order intervals.
+  "All upstream of X" is then an interval scan, no graph traversal at query time.
+- Writes dataset_reach.json (graph + intervals) and dataset_edges.csv (for review).
+No CLI; edit paths below.
+"""
+
+import os, io, re, csv, json
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+
+import buildindex as bi
+from lineagegraph import SymbolTable, CSR, open_index, index_is_fresh
+from backtrace6 import tok_only, program_name_from_file, parse_sas_member_from_raw, SYS_DDS
+
+# ---------------- configuration ----------------
+BASE = os.getcwd()
+CSV_VARS  = os.path.join(BASE, "variables.csv")
+LINEAGE_INDEX = os.path.join(BASE, "lineage.idx")   # SELECT handle -> ASSIGN ddname table
+CSV_JCL   = os.path.join(BASE, "jcl_index.csv")
+CSV_PROCS = os.path.join(BASE, "procs_index.csv")
+CSV_SAS   = os.path.join(BASE, "sas_index.csv")
+JCL_DIR   = os.path.join(BASE, "jcl")
+PROC_DIR  = os.path.join(BASE, "proc")
+OUT_REACH = os.path.join(BASE, "dataset_reach.json")
+OUT_EDGES = os.path.join(BASE, "dataset_edges.csv")
+QUERY = ""   # DSN, program, PROGRAM.DD or variable name; prints everything upstream of it
+
+REACH_VERSION = 1
+
+# ---------------- helpers ----------------
+RE_PGM = re.compile(r"\bPGM\s*=\s*([A-Z0-9$#@]+)", re.I)
+RE_GDG = re.compile(r"\(\s*[+-]?\d+\s*\)$")
+
+def load_csv_rows(path):
+    if not os.path.exists(path): return []
+    with io.open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def load_selects(index_path, csv_path=CSV_VARS):
+    """{FD/SELECT handle: [ASSIGN ddnames]} from a current lineage.idx, else {}."""
+    if not index_is_fresh(index_path, csv_path):
+        return {}
+    try:
+        L = open_index(index_path)
+    except ValueError:
+        return {}
+    return {L.dds[d]: L.ddnames_of(d) for d in range(len(L.dds)) if L.dd_ddnames.degree(d)}
+
+def exec_program(execspec: str) -> str:
+    """'PGM=SORT,PARM=..' -> 'SORT'; 'MYPROC' (proc call) -> 'MYPROC'."""
+    execspec = (execspec or "").upper()
+    m = RE_PGM.search(execspec)
+    if m: return m.group(1)
+    return re.split(r"[,( ]", execspec, 1)[0]
+
+def norm_dsn(dsn: str, file: str) -> str:
+    d = (dsn or "").strip().strip("'").upper()
+    if not d: return ""
+    d = RE_GDG.sub("", d)                     # PROD.X(+1) / PROD.X(0) -> PROD.X
+    if d.startswith("&&"):
+        d = f"{d}@{os.path.basename(file)}"   # temp datasets live only inside their job
+    return d
+
+def disp_writes(disp: str) -> bool:
+    status = (disp or "").strip().lstrip("(").split(",")[0].strip().upper()
+    return status in ("NEW", "MOD")
+
+def scan_step_rows(src_dir):
+    """JCL_FIELDS dicts of every member under src_dir, EXEC rows and overrides included."""
+    return [dict(zip(bi.JCL_FIELDS, r)) for p in bi.list_members(src_dir, bi.JCL_EXTS)
+            for r in bi.scan_jcl_member(p, steps=True)]
+
+def group_steps(rows):
+    """file -> [[step, execspec, [DD rows]], ...] in file order."""
+    files = defaultdict(list)
+    for r in rows:
+        steps = files[r.get("file","")]
+        step = (r.get("step","") or "").upper()
+        is_exec = not r.get("ddname")
+        if is_exec or not steps or steps[-1][0] != step:
+            steps.append([step, (r.get("exec","") or "").upper(), []])
+        if not is_exec:
+            steps[-1][2].append(r)
+    return files
+
+def expand_proc_call(proc_steps, call_rows):
+    """Effective [(procstep, execspec, DD rows)] of one PROC call: the call's PROCSTEP.DD
+    rows override (DSN/DISP) or add to that step, unqualified DDs apply to the first step."""
+    out = []
+    for k, (ps, execspec, rows) in enumerate(proc_steps):
+        dds = {tok_only(r.get("ddname","")): r for r in rows}
+        for r in call_rows:
+            qual, _, dd = (r.get("ddname","") or "").upper().rpartition(".")
+            if qual != ps and (qual or k):
+                continue
+            dd = tok_only(dd)
+            base = dds.get(dd)
+            if base is None:
+                dds[dd] = dict(r, ddname=dd)
+            else:
+                dds[dd] = dict(base, **{c: r[c] for c in ("dsn", "disp") if r.get(c)})
+        out.append((ps, execspec, list(dds.values())))
+    return out
+
+# ---------------- build ----------------
+class DatasetGraph:
+    """Labelled nodes, upstream CSR and the interval reachability index."""
+
+    def __init__(self):
+        self.labels = SymbolTable()             # "DSN:X", "STEP:file#step", "PGM:P", "PGMDD:P.DD"
+        self.up = CSR()
+        self.comp = array("i")                  # node -> component (post-order number)
+        self.comp_nodes = CSR()                 # component -> nodes
+        self.reach = CSR()                      # component -> flat [lo, hi, lo, hi, ...]
+        self.cyclic = array("b")                # component has a cycle (node reaches itself)
+        self.step_pgm = {}                      # step node -> program name
+        self.var_keys = {}                      # variable -> [[program, [dd, ...]], ...]
+
+    # ---- queries (no traversal) ----
+    def node(self, label):
+        return self.labels.get(label)
+
+    def reaches(self, src, dst):
+        """True if dst is upstream of src (node ids)."""
+        cs, cd = self.comp[src], self.comp[dst]
+        if cs == cd:
+            return src != dst or bool(self.cyclic[cs])
+        iv = self.reach.row(cs)
+        k = bisect_right(iv[0::2], cd) - 1
+        return k >= 0 and cd <= iv[2 * k + 1]
+
+    def upstream_ids(self, x):
+        c = self.comp[x]
+        iv = self.reach.row(c)
+        out = []
+        for k in range(0, len(iv), 2):
+            for cc in range(iv[k], iv[k + 1] + 1):
+                out.extend(self.comp_nodes.row(cc))
+        if not self.cyclic[c]:
+            out.remove(x)
+        return out
+
+    def starts(self, key):
+        """Node ids a DSN / program / PROGRAM.DD / variable query starts from."""
+        key = key.strip().upper()
+        starts = [self.node(l) for l in (f"DSN:{key}", f"PGM:{key}", f"PGMDD:{key}")]
+        starts = [s for s in starts if s >= 0]
+        for pgm, dds in self.var_keys.get(key, ()):
+            hit = [self.node(f"PGMDD:{pgm}.{d}") for d in dds]
+            hit = [h for h in hit if h >= 0] or [self.node(f"PGM:{pgm}")]
+            starts += [h for h in hit if h >= 0]
+        return starts
+
+    def upstream(self, key):
+        """Upstream of a DSN / program / PROGRAM.DD / variable: {kind: sorted names}."""
+        ids = set()
+        for s in self.starts(key):
+            ids.update(self.upstream_ids(s))
+        out = defaultdict(set)
+        for i in ids:
+            kind, name = self.labels[i].split(":", 1)
+            out[kind].add(name)
+            if kind == "STEP" and self.step_pgm.get(i):
+                out["PGM"].add(self.step_pgm[i])
+        return {k: sorted(v) for k, v in sorted(out.items())}
+
+def build_dataset_graph(var_rows, jcl_rows, sas_rows, proc_rows=(), selects=None):
+    """jcl_rows / proc_rows as in jcl_index.csv / procs_index.csv (EXEC rows with an
+    empty ddname and PROCSTEP.DD overrides too when scanned with steps=True). Proc rows
+    passed inside jcl_rows are treated as plain steps (no call expansion).
+    selects: {handle: [ddnames]} as load_selects() returns; handles not in it are
+    taken as ddnames."""
+    selects = selects or {}
+    G = DatasetGraph()
+    L = G.labels
+    src = array("i"); dst = array("i")
+    edges = set()
+    def edge(a, b, via):
+        ia, ib = L.intern(a), L.intern(b)
+        if (ia, ib) not in edges:
+            edges.add((ia, ib)); src.append(ia); dst.append(ib)
+            G_edges.append((a, b, via))
+    G_edges = []
+
+    # SAS member -> handles it reads / writes
+    sas_in = defaultdict(set); sas_out = defaultdict(set)
+    for r in sas_rows:
+        member = program_name_from_file(r.get("file",""))
+        h = tok_only(r.get("handle_or_ds",""))
+        if r.get("kind") == "INFILE": sas_in[member].add(h)
+        elif r.get("kind") == "FILE": sas_out[member].add(h)
+
+    # variable -> (program, ddnames it reads through) from variables.csv
+    var_keys = defaultdict(lambda: defaultdict(set))
+    for r in var_rows:
+        pgm = program_name_from_file(r.get("origin_file",""))
+        v = tok_only(r.get("variable",""))
+        if not (pgm and v): continue
+        for col in ("assign_target", "from_dd"):
+            for t in map(tok_only, (r.get(col,"") or "").split(";")):
+                if t: var_keys[v][pgm].update(selects.get(t, (t,)))
+    G.var_keys = {v: [[p, sorted(d)] for p, d in sorted(ps.items())] for v, ps in var_keys.items()}
+
+    def add_step(label, scope, execspec, rows):
+        """Edges of one (possibly proc-expanded) step; &&temps scoped to the scope file."""
+        pgm = exec_program(execspec)
+        member = ""
+        for r in rows:
+            if tok_only(r.get("ddname","")) == "SYSIN":
+                member = member or parse_sas_member_from_raw(r.get("raw",""))
+        if member and pgm.startswith("SAS"):
+            pgm = member                            # SAS steps are told apart by SYSIN member
+        for r in rows:
+            dd = tok_only(r.get("ddname",""))
+            dsn = norm_dsn(r.get("dsn",""), scope)
+            if not dd or dd in SYS_DDS or not dsn:
+                continue
+            if member and dd in sas_out[member]:   writes = True
+            elif member and dd in sas_in[member]:  writes = False
+            else:                                  writes = disp_writes(r.get("disp",""))
+            if writes:
+                edge(f"DSN:{dsn}", label, dd)
+            else:
+                edge(label, f"DSN:{dsn}", dd)
+                if pgm:
+                    edge(f"PGM:{pgm}", f"PGMDD:{pgm}.{dd}", dd)
+                    edge(f"PGMDD:{pgm}.{dd}", f"DSN:{dsn}", dd)
+        G.step_pgm[L.intern(label)] = pgm
+
+    # PROC bodies by name; each call expands them under the calling step
+    procs = {}
+    for file, steps in group_steps(proc_rows).items():
+        procs.setdefault(program_name_from_file(file), (file, steps))
+    called = set()
+    for file, steps in group_steps(jcl_rows).items():
+        for step, execspec, rows in steps:
+            proc = None if RE_PGM.search(execspec) else procs.get(exec_program(execspec))
+            if proc is None:
+                add_step(f"STEP:{file}#{step}", file, execspec, rows)
+                continue
+            called.add(proc[0])
+            for ps, ps_exec, ps_rows in expand_proc_call(proc[1], rows):
+                add_step(f"STEP:{file}#{step}.{ps}", file, ps_exec, ps_rows)
+    for file, steps in procs.values():
+        if file not in called:
+            for step, execspec, rows in steps:
+                add_step(f"STEP:{file}#{step}", file, execspec, rows)
+
+    n = len(L)
+    G.up = CSR.from_pairs(n, src, dst)
+    _index_reachability(G)
+    return G, G_edges
+
+def _index_reachability(G):
+    """Tarjan SCCs (emitted in post-order) + merged upstream intervals per component."""
+    n = len(G.labels); up = G.up
+    index = array("i", [-1]) * n; low = array("i", [0]) * n
+    comp = array("i", [-1]) * n
+    on_stack = bytearray(n); stack = []; members = []
+    counter = 0
+    for root in range(n):
+        if index[root] >= 0: continue
+        work = [(root, 0)]
+        index[root] = low[root] = counter; counter += 1
+        stack.append(root); on_stack[root] = 1
+        while work:
+            v, k = work[-1]
+            row = up.row(v)
+            if k < len(row):
+                work[-1] = (v, k + 1)
+                w = row[k]
+                if index[w] < 0:
+                    index[w] = low[w] = counter; counter += 1
+                    stack.append(w); on_stack[w] = 1
+                    work.append((w, 0))
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+            if low[v] == index[v]:
+                c = len(members); grp = []
+                while True:
+                    w = stack.pop(); on_stack[w] = 0
+                    comp[w] = c; grp.append(w)
+                    if w == v: break
+                members.append(grp)
+    G.comp = comp
+    G.comp_nodes = CSR.from_pairs(len(members), array("i", (comp[i] for i in range(n))), array("i", range(n)))
+
+    # successors of a component were emitted before it -> one pass in emission order
+    offsets = array("i", [0]); flat = array("i"); cyclic = array("b")
+    for c, grp in enumerate(members):
+        ivs = [(c, c)]
+        cyc = len(grp) > 1
+        for v in grp:
+            for w in up.row(v):
+                cw = comp[w]
+                if cw == c:
+                    cyc = True; continue
+                r = flat[offsets[cw]:offsets[cw + 1]]
+                ivs.extend(zip(r[0::2], r[1::2]))
+        ivs.sort()
+        merged = []
+        for lo, hi in ivs:
+            if merged and lo <= merged[-1][1] + 1:
+                if hi > merged[-1][1]: merged[-1][1] = hi
+            else:
+                merged.append([lo, hi])
+        for lo, hi in merged:
+            flat.append(lo); flat.append(hi)
+        offsets.append(len(flat)); cyclic.append(cyc)
+    G.reach = CSR(offsets, flat)
+    G.cyclic = cyclic
+
+# ---------------- persistence ----------------
+def save_reach(G, path):
+    doc = {"version": REACH_VERSION, "labels": list(G.labels.names),
+           "comp": G.comp.tolist(), "reach_off": list(G.reach.offsets), "reach": list(G.reach.targets),
+           "cyclic": G.cyclic.tolist(), "step_pgm": {str(k): v for k, v in G.step_pgm.items()},
+           "var_keys": G.var_keys}
+    with io.open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+
+def load_reach(path):
+    with io.open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    if doc.get("version") != REACH_VERSION:
+        raise ValueError(f"{path}: unsupported version")
+    G = DatasetGraph()
+    for l in doc["labels"]: G.labels.intern(l)
+    G.comp = array("i", doc["comp"])
+    ncomp = len(doc["reach_off"]) - 1
+    G.comp_nodes = CSR.from_pairs(ncomp, G.comp, array("i", range(len(G.comp))))
+    G.reach = CSR(array("i", doc["reach_off"]), array("i", doc["reach"]))
+    G.cyclic = array("b", doc["cyclic"])
+    G.step_pgm = {int(k): v for k, v in doc["step_pgm"].items()}
+    G.var_keys = doc["var_keys"]
+    return G
+
+def check_var_query(base=None, seed=7, size="tiny"):
+    """
+    Index a generated corpus (variables.csv + lineage.idx) and build the graph from its
+    ./jcl and ./proc. Every variable read through a SELECT handle whose ASSIGN ddname
+    feeds a PGMDD:P.DD node must start its query there. Returns the variables that don't.
+    """
+    import shutil, tempfile
+    import gencorpus, cobolindexer as ci
+    own = base is None
+    base = base or tempfile.mkdtemp(prefix="dsgraph-")
+    try:
+        gencorpus.generate(base, seed, **gencorpus.PRESETS[size])
+        store, _ = ci.build_store(ci.list_cobol_files(os.path.join(base, "cobol")))
+        vars_csv, idx = os.path.join(base, "variables.csv"), os.path.join(base, "lineage.idx")
+        ci.write_csv(store, vars_csv)
+        ci.write_lineage_index(store, idx)
+        var_rows = load_csv_rows(vars_csv)
+        G, _ = build_dataset_graph(var_rows, scan_step_rows(os.path.join(base, "jcl")), [],
+                                   scan_step_rows(os.path.join(base, "proc")), load_selects(idx, vars_csv))
+        bad = set()
+        for r in var_rows:
+            pgm, v = program_name_from_file(r["origin_file"]), tok_only(r["variable"])
+            want = {f"PGMDD:{pgm}.{store.select_map[t]}" for t in r["from_dd"].split(";")
+                    if t in store.select_map}
+            want = {w for w in want if G.node(w) >= 0}
+            if not want <= {G.labels[s] for s in G.starts(v)}:
+                bad.add(v)
+        return sorted(bad)
+    finally:
+        if own:
+            shutil.rmtree(base, ignore_errors=True)
+
+# ---------------- main ----------------
+def main():
+    var_rows = load_csv_rows(CSV_VARS)
+    jcl_rows = scan_step_rows(JCL_DIR) if os.path.isdir(JCL_DIR) else load_csv_rows(CSV_JCL)
+    proc_rows = scan_step_rows(PROC_DIR) if os.path.isdir(PROC_DIR) else load_csv_rows(CSV_PROCS)
+    sas_rows = load_csv_rows(CSV_SAS)
+    G, edges = build_dataset_graph(var_rows, jcl_rows, sas_rows, proc_rows, load_selects(LINEAGE_INDEX))
+    save_reach(G, OUT_REACH)
+    with io.open(OUT_EDGES, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["downstream", "upstream", "ddname"])
+        w.writerows(edges)
+    ncomp = len(G.reach.offsets) - 1
+    print(f"Wrote {OUT_REACH} ({len(G.labels)} nodes, {len(edges)} edges, {ncomp} components, "
+          f"{len(G.reach.targets) // 2} intervals) and {OUT_EDGES}")
+    if QUERY:
+        for kind, names in G.upstream(QUERY).items():
+            print(f"{kind}: {', '.join(names)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+docxio.py — DOCX (zip) I/O for the comparators
+- rebuild(original, replace, out) writes original with some members replaced: untouched
+  members (images, embedded objects, styles, ...) are copied as their raw compressed bytes
+  with the original CRC / sizes, only the replaced members are deflated. The zip is written
+  straight to out (any binary file object), nothing else is held in memory.
+- changed_members(base, rev, names) lists the members whose content differs between two
+  packages without inflating the identical ones (size + CRC from the central directory,
+  then the raw compressed bytes; only a tie on both but different raw bytes is inflated).
+- read_members(docx, names) reads just those members.
+Packages needing zip64 (or with encrypted members) fall back to a plain zipfile rewrite.
+bench() compares the old full re-deflate against rebuild() on a synthetic image-heavy DOCX.
+"""
+
+import io, os, time, zlib, struct, random, zipfile, tempfile, tracemalloc
+
+LEVEL = 6               # deflate level for replaced members (zlib default)
+CHUNK = 1 << 20         # raw copy block size when the source is a file object
+
+_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END = struct.Struct("<IHHHHIIH")
+_LOCAL_SIG, _CENTRAL_SIG, _END_SIG = 0x04034B50, 0x02014B50, 0x06054B50
+_LIMIT = 0xFFFFFFFF
+
+# ---------------- reading ----------------
+def _source(src):
+    """(file object, bytes view or None) for bytes-like or binary file object src."""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return io.BytesIO(src), memoryview(src)
+    return src, None
+
+def _data_offset(fp, view, info):
+    """Offset of a member's compressed data (past its local header)."""
+    if view is not None:
+        head = bytes(view[info.header_offset:info.header_offset + _LOCAL.size])
+    else:
+        fp.seek(info.header_offset)
+        head = fp.read(_LOCAL.size)
+    fields = _LOCAL.unpack(head)
+    if fields[0] != _LOCAL_SIG:
+        raise zipfile.BadZipFile(f"bad local header for {info.filename!r}")
+    return info.header_offset + _LOCAL.size + fields[9] + fields[10]
+
+def _raw(fp, view, info):
+    """Raw compressed bytes of a member (a view when the source is in memory)."""
+    start = _data_offset(fp, view, info)
+    if view is not None:
+        return view[start:start + info.compress_size]
+    fp.seek(start)
+    return fp.read(info.compress_size)
+
+def read_members(docx, names):
+    """{name: bytes} for the members of docx listed in names (missing ones left out)."""
+    fp, _ = _source(docx)
+    with zipfile.ZipFile(fp) as z:
+        have = set(z.namelist())
+        return {n: z.read(n) for n in names if n in have}
+
+def changed_members(base, rev, names=None):
+    """Members present in both packages (restricted to names) whose content differs."""
+    fa, va = _source(base)
+    fb, vb = _source(rev)
+    with zipfile.ZipFile(fa) as za, zipfile.ZipFile(fb) as zb:
+        rev_infos = {i.filename: i for i in zb.infolist()}
+        out = []
+        for ia in za.infolist():
+            if names is not None and ia.filename not in names:
+                continue
+            ib = rev_infos.get(ia.filename)
+            if ib is None:
+                continue
+            if ia.file_size != ib.file_size or ia.CRC != ib.CRC:
+                out.append(ia.filename)
+            elif _raw(fa, va, ia) != _raw(fb, vb, ib) and za.read(ia) != zb.read(ib):
+                out.append(ia.filename)
+        if names is not None:
+            order = {n: k for k, n in enumerate(names)}
+            out.sort(key=order.__getitem__)
+        return out
+
+# ---------------- writing ----------------
+def _dos_time(date_time):
+    y, mo, d, h, mi, s = date_time
+    return (max(y, 1980) - 1980) << 9 | mo << 5 | d, h << 11 | mi << 5 | s // 2
+
+def _encode_name(info):
+    """(encoded filename, flag bits) the way zipfile writes them."""
+    try:
+        return info.filename.encode("ascii"), info.flag_bits & ~0x800
+    except UnicodeEncodeError:
+        return info.filename.encode("utf-8"), info.flag_bits | 0x800
+
+class _Writer:
+    """Minimal zip writer: local header + data per member, central directory at close."""
+
+    def __init__(self, out):
+        self.out = out
+        self.pos = 0
+        self.central = []
+
+    def _write(self, b):
+        self.out.write(b)
+        self.pos += len(b)
+
+    def add(self, info, method, crc, csize, usize, data_blocks):
+        name, flags = _encode_name(info)
+        flags &= ~0x08                     # sizes go in the local header, no data descriptor
+        date, tm = _dos_time(info.date_time)
+        offset = self.pos
+        version = 20 if method == zipfile.ZIP_DEFLATED else 10
+        self._write(_LOCAL.pack(_LOCAL_SIG, version, flags, method, tm, date,
+                                crc, csize, usize, len(name), 0))
+        self._write(name)
+        for block in data_blocks:
+            self._write(block)
+        self.central.append((name, flags, method, tm, date, crc, csize, usize, version,
+                             info.create_system, info.internal_attr, info.external_attr,
+                             info.comment, offset))
+
+    def close(self, comment=b""):
+        start = self.pos
+        for (name, flags, method, tm, date, crc, csize, usize, version,
+             system, iattr, eattr, mcomment, offset) in self.central:
+            self._write(_CENTRAL.pack(_CENTRAL_SIG, system << 8 | version, version, flags,
+                                      method, tm, date, crc, csize, usize, len(name), 0,
+                                      len(mcomment), 0, iattr, eattr, offset))
+            self._write(name)
+            self._write(mcomment)
+        size = self.pos - start
+        n = len(self.central)
+        self._write(_END.pack(_END_SIG, 0, 0, n, n, size, start, len(comment)))
+        self._write(comment)
+
+def _blocks(fp, view, info):
+    if view is not None:
+        yield _raw(fp, view, info)
+        return
+    fp.seek(_data_offset(fp, view, info))
+    left = info.compress_size
+    while left:
+        b = fp.read(min(CHUNK, left))
+        if not b:
+            raise zipfile.BadZipFile(f"truncated member {info.filename!r}")
+        left -= len(b)
+        yield b
+
+def _needs_fallback(infos, replace, src_size):
+    if len(infos) >= 0xFFFF or src_size >= _LIMIT:
+        return True
+    for i in infos:
+        if i.flag_bits & 0x01 or i.file_size >= _LIMIT or i.compress_size >= _LIMIT:
+            return True
+    return any(len(data) >= _LIMIT for data in replace.values())
+
+def _rebuild_zipfile(zin, replace, out):
+    """The plain path: every member inflated and re-deflated by zipfile."""
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            data = replace.get(item.filename)
+            zout.writestr(item, zin.read(item.filename) if data is None else data)
+
+def rebuild(original, replace, out=None, level=None):
+    """Write original with the members in replace ({name: bytes}) swapped in, to out.
+    Untouched members are copied raw. Returns the bytes when out is None, else out."""
+    to_bytes = out is None
+    out = io.BytesIO() if to_bytes else out
+    level = LEVEL if level is None else level
+    fp, view = _source(original)
+    with zipfile.ZipFile(fp) as zin:
+        infos = zin.infolist()
+        fp.seek(0, os.SEEK_END)
+        if _needs_fallback(infos, replace, fp.tell()):
+            _rebuild_zipfile(zin, replace, out)
+        else:
+            w = _Writer(out)
+            for info in infos:
+                data = replace.get(info.filename)
+                if data is None:
+                    w.add(info, info.compress_type, info.CRC, info.compress_size,
+                          info.file_size, _blocks(fp, view, info))
+                    continue
+                c = zlib.compressobj(level, zlib.DEFLATED, -15)
+                packed = c.compress(data) + c.flush()
+                w.add(info, zipfile.ZIP_DEFLATED, zlib.crc32(data), len(packed), len(data), (packed,))
+            w.close(zin.comment)
+    return out.getvalue() if to_bytes else out
+
+# ---------------- benchmark ----------------
+def synthetic_docx(images=40, image_kb=400, paragraphs=4000, seed=3):
+    """An image-heavy DOCX-shaped package (document, header/footer parts, media)."""
+    rnd = random.Random(seed)
+    body = "".join(f"<w:p><w:r><w:t>Clause {k} {rnd.random():.6f}</w:t></w:r></w:p>"
+                   for k in range(paragraphs))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", "<Types/>")
+        z.writestr("word/document.xml", f"<w:document><w:body>{body}</w:body></w:document>")
+        for part in ("header1", "footer1"):
+            z.writestr(f"word/{part}.xml", f"<w:{part[:-1]}><w:p/></w:{part[:-1]}>")
+        for k in range(images):
+            # already-compressed content, like JPEG/PNG: random bytes deflate poorly
+            z.writestr(f"word/media/image{k}.png", rnd.randbytes(image_kb * 1024))
+    return buf.getvalue()
+
+def _rebuild_old(original, replace):
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(original)) as zin:
+        _rebuild_zipfile(zin, replace, out)
+    return out.getvalue()
+
+def bench(**kw):
+    """Seconds and peak traced memory (MB) of the old and new rebuild of one XML part."""
+    docx = synthetic_docx(**kw)
+    new_doc = read_members(docx, ["word/document.xml"])["word/document.xml"].replace(b"Clause", b"Section")
+    replace = {"word/document.xml": new_doc}
+    res = {}
+    for label, fn in (("re-deflate", lambda: _rebuild_old(docx, replace)),
+                      ("raw copy", lambda: rebuild(docx, replace)),
+                      ("raw → file", lambda: rebuild(docx, replace, out=tempfile.TemporaryFile()))):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        got = fn()
+        secs = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        f = io.BytesIO(got) if isinstance(got, bytes) else got
+        with f, zipfile.ZipFile(f) as z:
+            assert z.testzip() is None and z.read("word/document.xml") == new_doc
+        res[label] = (round(secs, 3), round(peak, 1))
+        print(f"{label:<11} {secs:>7.3f}s  peak {peak:>7.1f} MB  ({len(docx) / 2**20:.1f} MB package)")
+    return res
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gencorpus.py — seeded synthetic mainframe corpus for the lineage pipeline
+Writes under OUT_DIR:
+  cobol/     programs with SELECT/ASSIGN, FD + 01/05/10 hierarchies, REDEFINES, 88s,
+             COPY of shared copybooks, READ INTO, MOVE chains and multi-line COMPUTEs
+  copybook/  shared record layouts (the names programs COPY; every 4th one COPYs the
+             layout before it, so expansion and change tracking see nested members)
+  jcl/       jobs running those programs: DD names match the ASSIGNs, datasets chain
+             from job to job (GDG generations, &&temps, continuation lines, PROC calls
+             with a PROCSTEP.DD override feeding the proc, whose output later jobs read)
+  proc/      cataloged procedures (SORT steps)
+  sas/       SAS members (INFILE/FILE/SET/MERGE) run through SYSIN DSN=LIB(MEMBER)
+Same seed + sizes -> byte-identical corpus, so benchmark runs are comparable.
+No CLI; edit the configuration below (or call generate()).
+"""
+
+import os, random, shutil
+
+# ---------------- configuration ----------------
+OUT_DIR = os.path.join(os.getcwd(), "corpus")
+SEED = 1
+SIZE = "small"
+
+PRESETS = {
+    #           programs vars/pgm copybooks jobs  procs sas
+    "tiny":   dict(programs=10,    vars_per_program=30,  copybooks=4,   jobs=8,     procs=2,   sas=3),
+    "small":  dict(programs=200,   vars_per_program=80,  copybooks=30,  jobs=150,   procs=20,  sas=40),
+    "medium": dict(programs=2000,  vars_per_program=150, copybooks=200, jobs=1500,  procs=150, sas=400),
+    "large":  dict(programs=10000, vars_per_program=300, copybooks=800, jobs=10000, procs=800, sas=3000),
+}
+
+HLQS = ["PROD", "FIN", "CUST", "RISK", "LOAN"]
+
+# ---------------- COBOL ----------------
+def _pic(rnd):
+    return rnd.choice(["PIC X(10)", "PIC X(30)", "PIC 9(5)", "PIC S9(7)V99 COMP-3", "PIC 9(8)"])
+
+def copybook_text(rnd, k, nfields):
+    """01-level layout CPY-REC-k with a group level and one REDEFINES."""
+    L = [f"       01  CPY-REC-{k}."]
+    fields = []
+    for i in range(nfields):
+        if i % 6 == 0:
+            L.append(f"           05  CPY{k}-GRP-{i}.")
+        n = f"CPY{k}-FLD-{i}"
+        L.append(f"               10  {n} {_pic(rnd)}.")
+        fields.append(n)
+    L.append(f"           05  CPY{k}-ALT REDEFINES CPY{k}-GRP-0 PIC X(40).")
+    return "\n".join(L) + "\n", fields + [f"CPY{k}-ALT"]
+
+def program_text(rnd, p, nvars, copybooks, n_in):
+    """One program reading n_in files (DD INDD1..), writing OUTDD1; returns (text, dd names)."""
+    L = ["       IDENTIFICATION DIVISION.", f"       PROGRAM-ID. PGM{p:05d}.",
+         "       ENVIRONMENT DIVISION.", "       INPUT-OUTPUT SECTION.", "       FILE-CONTROL."]
+    ins = [f"INDD{i + 1}" for i in range(n_in)]
+    for i, dd in enumerate(ins):
+        L.append(f"           SELECT IN-FILE-{i + 1} ASSIGN TO {dd}")
+        L.append("               ORGANIZATION IS SEQUENTIAL")
+        L.append(f"               FILE STATUS IS WS-FS-{i + 1}.")
+    L.append("           SELECT OUT-FILE ASSIGN TO OUTDD1.")
+    L += ["       DATA DIVISION.", "       FILE SECTION."]
+
+    fields = []                                    # every elementary name the program can move
+    per_rec = max(3, nvars // (3 * (n_in + 1)))
+    for i in range(n_in):
+        L.append(f"       FD  IN-FILE-{i + 1}.")
+        L.append(f"       01  IN{i + 1}-REC.")
+        for j in range(per_rec):
+            if j % 5 == 0:
+                L.append(f"           05  IN{i + 1}-GRP-{j}.")
+            n = f"IN{i + 1}-P{p}-F{j}"
+            L.append(f"               10  {n} {_pic(rnd)}.")
+            fields.append(n)
+        L.append(f"           05  IN{i + 1}-KEY-R REDEFINES IN{i + 1}-GRP-0 PIC X(20).")
+    L.append("       FD  OUT-FILE.")
+    L.append("       01  OUT-REC.")
+    outs = []
+    for j in range(per_rec):
+        n = f"OUT-P{p}-F{j}"
+        L.append(f"           05  {n} {_pic(rnd)}.")
+        outs.append(n)
+
+    L.append("       WORKING-STORAGE SECTION.")
+    for i in range(n_in):
+        L.append(f"       01  WS-FS-{i + 1} PIC XX.")
+        L.append(f"           88  WS-FS-{i + 1}-OK VALUE '00'.")
+    L.append("       01  WS-AREA.")
+    ws = []
+    for j in range(max(3, nvars // 3)):
+        n = f"WS-P{p}-V{j}"
+        L.append(f"           05  {n} {_pic(rnd)}.")
+        ws.append(n)
+    L.append(f"       01  WS-BUF-{p} PIC X(200).")
+    used = rnd.sample(copybooks, min(len(copybooks), rnd.randint(1, 3)))
+    for name, _ in used:
+        L.append(f"           COPY {name}.")
+    cpy_fields = [f for _, fs in used for f in fs]
+
+    L.append("       PROCEDURE DIVISION.")
+    L.append("       MAIN-PARA.")
+    for i in range(n_in):
+        L.append(f"           READ IN-FILE-{i + 1} INTO IN{i + 1}-REC")
+        L.append("               AT END CONTINUE")
+        L.append("           END-READ.")
+    src_pool = fields + cpy_fields
+    # MOVE chains: input field -> ws -> ws -> ... -> output
+    chain_len = max(2, min(12, len(ws) // 3))
+    for c in range(max(1, nvars // chain_len)):
+        prev = rnd.choice(src_pool)
+        for _ in range(chain_len):
+            nxt = rnd.choice(ws)
+            if rnd.random() < 0.2:
+                other = rnd.choice(src_pool + ws)
+                L.append(f"           COMPUTE {nxt} = {prev} +")
+                L.append(f"               {other} * 2.")
+            else:
+                L.append(f"           MOVE {prev} TO {nxt}.")
+            prev = nxt
+        L.append(f"           MOVE {prev} TO {rnd.choice(outs)}. *> chain {c}")
+    L.append("      * MOVE COMMENTED-OUT TO NOTHING.")
+    L.append("           WRITE OUT-REC.")
+    L.append("           STOP RUN.")
+    return "\n".join(L) + "\n", ins
+
+# ---------------- JCL / PROC / SAS ----------------
+def job_text(rnd, j, steps, datasets):
+    """Job j: steps run programs/SAS/PROCs; each step reads earlier datasets and writes a new one."""
+    L = [f"//JOB{j:05d} JOB (ACCT),'LINEAGE',CLASS=A,MSGCLASS=X", "//* generated"]
+    made = []
+    for s, (kind, what, n_in) in enumerate(steps):
+        step = f"STEP{s + 1:02d}"
+        if kind == "PGM":
+            L.append(f"//{step} EXEC PGM={what}")
+        elif kind == "SAS":
+            L.append(f"//{step} EXEC SAS")
+            L.append(f"//SYSIN    DD DSN=SAS.PROD.LIB({what}),DISP=SHR")
+        else:
+            L.append(f"//{step} EXEC {what}")
+            if datasets:                           # feed the proc's SORTIN from an earlier dataset
+                L.append(f"//SORT{what[4:]}.SORTIN DD DSN={rnd.choice(datasets)},DISP=SHR")
+            made.append(f"PROD.SORTED.P{what[4:]}")
+            continue
+        ins = [rnd.choice(datasets) for _ in range(n_in)] if datasets else []
+        for i, dsn in enumerate(ins):
+            dd = f"INDD{i + 1}"
+            if rnd.random() < 0.25:
+                L.append(f"//{dd:<8} DD DISP=SHR,")
+                L.append(f"//            DSN={dsn}")
+            else:
+                L.append(f"//{dd:<8} DD DSN={dsn},DISP=SHR")
+        out = f"{rnd.choice(HLQS)}.J{j:05d}.S{s + 1:02d}.OUT"
+        if rnd.random() < 0.3:
+            L.append(f"//OUTDD1   DD DSN={out}(+1),DISP=(NEW,CATLG,DELETE),")
+            L.append("//            DCB=(RECFM=FB,LRECL=200,BLKSIZE=0)")
+        else:
+            L.append(f"//OUTDD1   DD DSN={out},DISP=(NEW,CATLG,DELETE),DCB=(RECFM=FB,LRECL=200)")
+        L.append("//SYSOUT   DD SYSOUT=*")
+        made.append(out)
+    return "\n".join(L) + "\n", made
+
+def proc_text(k):
+    return "\n".join([
+        f"//PROC{k:04d} PROC",
+        f"//SORT{k:04d} EXEC PGM=SORT",
+        f"//SORTIN   DD DSN=&&WORK{k},DISP=(OLD,DELETE)",
+        f"//SORTOUT  DD DSN=PROD.SORTED.P{k:04d},DISP=(NEW,CATLG)",
+        "//SYSOUT   DD SYSOUT=*",
+        "//SYSIN    DD *",
+        "  SORT FIELDS=(1,10,CH,A)",
+        "/*",
+    ]) + "\n"
+
+def sas_text(k):
+    return "\n".join([
+        f"DATA WORK.OUT{k};",
+        "  INFILE INDD1 LRECL=200;",
+        "  FILE OUTDD1;",
+        f"  SET WORK.A{k} WORK.B{k};",
+        "RUN;",
+        f"DATA WORK.M{k};",
+        f"  MERGE WORK.OUT{k} WORK.A{k} BY KEY;",
+        "RUN;",
+    ]) + "\n"
+
+# ---------------- driver ----------------
+def generate(root=OUT_DIR, seed=SEED, programs=200, vars_per_program=80, copybooks=30,
+             jobs=150, procs=20, sas=40, clean=True):
+    """Write the corpus; returns counts (files and lines per kind)."""
+    rnd = random.Random(seed)
+    if clean and os.path.isdir(root):
+        for sub in ("cobol", "copybook", "jcl", "proc", "sas"):
+            shutil.rmtree(os.path.join(root, sub), ignore_errors=True)
+    for sub in ("cobol", "copybook", "jcl", "proc", "sas"):
+        os.makedirs(os.path.join(root, sub), exist_ok=True)
+    stats = {"seed": seed}
+    lines = 0
+
+    def put(sub, name, text):
+        nonlocal lines
+        with open(os.path.join(root, sub, name), "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        lines += text.count("\n")
+
+    cpys = []
+    for k in range(copybooks):
+        text, fields = copybook_text(rnd, k, rnd.randint(6, 24))
+        if k % 4 == 3:                                 # nested COPY of the previous layout
+            text += f"           COPY CPYREC{k - 1:04d}.\n"
+        put("copybook", f"CPYREC{k:04d}.cpy", text)
+        cpys.append((f"CPYREC{k:04d}", fields))
+    pgm_inputs = []
+    for p in range(programs):
+        n_in = rnd.choice([1, 1, 2, 3])
+        text, _ = program_text(rnd, p, vars_per_program, cpys or [("NOCPY", [])], n_in)
+        put("cobol", f"PGM{p:05d}.cbl", text)
+        pgm_inputs.append(n_in)
+    for k in range(procs):
+        put("proc", f"PROC{k:04d}.proc", proc_text(k))
+    for k in range(sas):
+        put("sas", f"SASM{k:04d}.sas", sas_text(k))
+
+    datasets = [f"{h}.SOURCE.FEED{i}" for i, h in enumerate(HLQS)]
+    for j in range(jobs):
+        steps = []
+        for _ in range(rnd.randint(1, 4)):
+            r = rnd.random()
+            if r < 0.75 and programs:
+                p = rnd.randrange(programs)
+                steps.append(("PGM", f"PGM{p:05d}", pgm_inputs[p]))
+            elif r < 0.9 and sas:
+                steps.append(("SAS", f"SASM{rnd.randrange(sas):04d}", 1))
+            elif procs:
+                steps.append(("PROC", f"PROC{rnd.randrange(procs):04d}", 0))
+        text, made = job_text(rnd, j, steps, datasets[-400:])
+        put("jcl", f"JOB{j:05d}.jcl", text)
+        datasets.extend(made)
+
+    stats.update(programs=programs, copybooks=copybooks, jobs=jobs, procs=procs, sas=sas,
+                 vars_per_program=vars_per_program, lines=lines)
+    return stats
+
+def main():
+    stats = generate(OUT_DIR, SEED, **PRESETS[SIZE])
+    print(f"Wrote {SIZE} corpus to {OUT_DIR}: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lineagegraph.py — compact graph building blocks for the COBOL lineage tools.
+
+Used by cobolindexer.py (Store) and backtrace6.py (scoped graph):
+- SymbolTable: interns variable / file / DD names to dense ints (0..n-1)
+- CSR:         frozen adjacency; row i's targets are targets[offsets[i]:offsets[i+1]]
+               (both array('i'), sorted and de-duplicated per row)
+- ScopedGraph: the scoped variable graph, built from variables.csv-shaped rows
+- write_index / open_index: versioned binary index (lineage.idx) that the indexer
+  writes next to variables.csv and the backtrace/query tools mmap lazily
+
+Edges are collected as two parallel array('i') (source, target) while building and
+frozen once with CSR.from_pairs(), so the graph costs ~8 bytes per edge instead of a
+Python set entry per edge.
+"""
+
+import io, os, sys, json, mmap
+from array import array
+from collections.abc import Mapping
+
+
+class SymbolTable:
+    """str <-> int interning; ids are handed out in first-seen order."""
+    __slots__ = ("ids", "names")
+
+    def __init__(self, names=()):
+        self.ids = {}
+        self.names = []
+        for s in names:
+            self.intern(s)
+
+    def intern(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.names)
+            self.names.append(s)
+        return i
+
+    def get(self, s, default=-1):
+        return self.ids.get(s, default)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, s):
+        return s in self.ids
+
+    def __getitem__(self, i):
+        return self.names[i]
+
+
+class CSR:
+    """Compressed sparse rows over n nodes."""
+    __slots__ = ("offsets", "targets")
+
+    def __init__(self, offsets=None, targets=None):
+        self.offsets = offsets if offsets is not None else array("i", [0])
+        self.targets = targets if targets is not None else array("i")
+
+    @classmethod
+    def from_pairs(cls, n, src, dst):
+        """Build from parallel src/dst sequences; rows are sorted and de-duplicated."""
+        counts = array("i", bytes(4 * (n + 1)))
+        for s in src:
+            counts[s + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        fill = array("i", counts)
+        raw = array("i", bytes(4 * len(src)))
+        for s, d in zip(src, dst):
+            raw[fill[s]] = d
+            fill[s] += 1
+
+        offsets = array("i", [0])
+        targets = array("i")
+        for i in range(n):
+            lo, hi = counts[i], counts[i + 1]
+            if hi - lo == 1:
+                targets.append(raw[lo])
+            elif hi > lo:
+                targets.extend(sorted(set(raw[lo:hi])))
+            offsets.append(len(targets))
+        return cls(offsets, targets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def row(self, i):
+        if i + 1 >= len(self.offsets):
+            return ()
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def degree(self, i):
+        if i + 1 >= len(self.offsets):
+            return 0
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def pairs(self):
+        """Yield (source, target) for every edge."""
+        off, tg = self.offsets, self.targets
+        for i in range(len(off) - 1):
+            for k in range(off[i], off[i + 1]):
+                yield i, tg[k]
+
+    def reverse(self, n=None):
+        """Transpose (target -> sources); n defaults to the same node count."""
+        n = len(self) if n is None else n
+        src = array("i"); dst = array("i")
+        for s, d in self.pairs():
+            src.append(d); dst.append(s)
+        return CSR.from_pairs(n, src, dst)
+
+
+class StringTable:
+    """
+    Read-only SymbolTable look-alike over an mmap'd index: names are decoded on access
+    and get() bisects a name-sorted id list, so nothing is loaded up front.
+    """
+    __slots__ = ("blob", "offs", "order")
+
+    def __init__(self, blob, offs, order):
+        self.blob, self.offs, self.order = blob, offs, order
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offs[i]:self.offs[i + 1]]).decode("utf-8")
+
+    def __len__(self):
+        return len(self.offs) - 1
+
+    def get(self, s, default=-1):
+        key = s.encode("utf-8")
+        blob, offs, order = self.blob, self.offs, self.order
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = order[mid]
+            cur = bytes(blob[offs[i]:offs[i + 1]])
+            if cur < key:
+                lo = mid + 1
+            elif cur > key:
+                hi = mid
+            else:
+                return i
+        return default
+
+    def __contains__(self, s):
+        return self.get(s) >= 0
+
+
+class ScopedGraph:
+    """
+    Scoped variable graph used by backtrace6.py.
+
+    Var nodes are 0..n-1 (one per (scope root, origin_file, name)); DD and ASSIGN
+    literals are pseudo nodes n+d and n+len(dds)+a, so a trace path is a plain list
+    of ints and label() turns a node back into "NAME" / "DD:x" / "ASSIGN:x".
+
+    Besides the scoped edges (parent, sources) each node keeps its raw parent name
+    and raw direct sources (by name) for the name-keyed tools (Trace, Cobol7).
+    The reverse edges (children, consumers = nodes that read a node, assign_nodes)
+    are built with the graph so downstream (impact) walks need no inversion pass.
+    DDs are often FD/SELECT handles (IN-FILE-1) while JCL binds the ASSIGN ddname
+    (INDD1): dd_ddnames maps a DD to the ddnames its SELECT assigns, ddname_dds back.
+    """
+    __slots__ = ("n", "names", "files", "dds", "assigns", "ddnames",
+                 "node_name", "node_file", "node_root", "parent", "node_pname",
+                 "sources", "raw_sources", "from_dd", "assign", "dd_nodes", "dd_assigns",
+                 "name_nodes", "children", "consumers", "assign_nodes",
+                 "dd_ddnames", "ddname_dds", "_mm")
+
+    def __init__(self):
+        self.n = 0
+        self.names, self.files = SymbolTable(), SymbolTable()
+        self.dds, self.assigns = SymbolTable(), SymbolTable()
+        self.ddnames = SymbolTable()
+        self.node_name = array("i"); self.node_file = array("i")
+        self.node_root = array("i"); self.parent = array("i"); self.node_pname = array("i")
+        self.sources = CSR(); self.raw_sources = CSR()
+        self.from_dd = CSR(); self.assign = CSR()
+        self.dd_nodes = CSR(); self.dd_assigns = CSR(); self.name_nodes = CSR()
+        self.children = CSR(); self.consumers = CSR(); self.assign_nodes = CSR()
+        self.dd_ddnames = CSR(); self.ddname_dds = CSR()
+        self._mm = None
+
+    def is_var(self, x):
+        return x < self.n
+
+    def is_dd(self, x):
+        return self.n <= x < self.n + len(self.dds)
+
+    def is_assign(self, x):
+        return x >= self.n + len(self.dds)
+
+    def dd_node(self, d):
+        return self.n + d
+
+    def assign_node(self, a):
+        return self.n + len(self.dds) + a
+
+    def name(self, x):
+        return self.names[self.node_name[x]]
+
+    def file(self, x):
+        return self.files[self.node_file[x]]
+
+    def label(self, x):
+        if x < self.n:
+            return self.names[self.node_name[x]]
+        x -= self.n
+        if x < len(self.dds):
+            return "DD:" + self.dds[x]
+        return "ASSIGN:" + self.assigns[x - len(self.dds)]
+
+    def nodes_named(self, name):
+        i = self.names.get(name)
+        return self.name_nodes.row(i) if i >= 0 else ()
+
+    def dds_for_ddname(self, ddname):
+        """DD ids bound to a JCL ddname: the DD of that name and the handles assigned to it."""
+        out = set()
+        d = self.dds.get(ddname)
+        if d >= 0: out.add(d)
+        k = self.ddnames.get(ddname)
+        if k >= 0: out.update(self.ddname_dds.row(k))
+        return sorted(out)
+
+    def ddnames_of(self, d):
+        """ASSIGN ddnames a DD id (SELECT handle) is bound to; the DD's own name otherwise."""
+        row = self.dd_ddnames.row(d)
+        return [self.ddnames[k] for k in row] if len(row) else [self.dds[d]]
+
+
+_UNSEEN, _DEAD = -1, -2                     # build_scoped root memo states
+
+def build_scoped(rows, selects=()):
+    """
+    Build a ScopedGraph from variables.csv-shaped rows, already cleaned:
+      (name, origin_file, parent_name, [from_dd], [assign], [direct_sources])
+    Each row's scope root is found by walking parent_name within the same origin_file;
+    a node is one (root, origin_file, name) and parents/sources only link inside a scope.
+    selects: (SELECT handle, ASSIGN ddname) pairs (the indexer's select_map); handles
+    that are not a DD of the graph are left out.
+    """
+    G = ScopedGraph()
+    names, files = G.names, G.files
+
+    # --- pass 1: per-row fields ---
+    row_name = array("i"); row_file = array("i"); row_parent = array("i")
+    dd_pairs  = (array("i"), array("i"))   # (row, dd id)
+    at_pairs  = (array("i"), array("i"))   # (row, assign id)
+    src_pairs = (array("i"), array("i"))   # (row, source name id)
+    by_file_name = {}                      # (origin_file, name) -> first row id
+
+    for name, origin_file, parent_name, from_dd, assign, sources in rows:
+        idx = len(row_name)
+        nid = names.intern(name)
+        fid = files.intern(origin_file)
+        row_name.append(nid); row_file.append(fid)
+        row_parent.append(names.intern(parent_name) if parent_name else -1)
+        by_file_name.setdefault((fid, nid), idx)
+        for t in from_dd:
+            dd_pairs[0].append(idx); dd_pairs[1].append(G.dds.intern(t))
+        for t in assign:
+            at_pairs[0].append(idx); at_pairs[1].append(G.assigns.intern(t))
+        for t in sources:
+            src_pairs[0].append(idx); src_pairs[1].append(names.intern(t))
+
+    # parent link per row: row index of (file, parent_name), -1 if none/unknown
+    nrows = len(row_name)
+    link = array("i", [-1]) * nrows
+    for i in range(nrows):
+        if row_parent[i] >= 0:
+            link[i] = by_file_name.get((row_file[i], row_parent[i]), -1)
+
+    # --- pass 2: root per row, memoized over shared parent chains ---
+    # Same result as walking each chain on its own: a chain ending in a row
+    # without parent_name roots at that row; one ending in an unknown parent
+    # roots every start at itself (_DEAD); a cycle roots at the first repeat.
+    memo = array("i", [_UNSEEN]) * nrows
+    for i in range(nrows):
+        if memo[i] != _UNSEEN:
+            continue
+        path = []; pos = {}; cur = i
+        while True:
+            if memo[cur] != _UNSEEN:
+                r = memo[cur]; break
+            if cur in pos:
+                for c in path[pos[cur]:]:
+                    memo[c] = c              # cycle members: each is its own first repeat
+                del path[pos[cur]:]
+                r = cur; break
+            pos[cur] = len(path); path.append(cur)
+            if row_parent[cur] < 0:
+                r = cur; break
+            if link[cur] < 0:
+                r = _DEAD; break
+            cur = link[cur]
+        for x in path:
+            memo[x] = r
+    roots = array("i", (i if memo[i] == _DEAD else memo[i] for i in range(nrows)))
+
+    # nodes: one per (root_idx, origin_file, name)
+    scoped_index = {}
+    node_of_row = array("i")
+    for i in range(nrows):
+        key = (roots[i], row_file[i], row_name[i])
+        nid = scoped_index.get(key)
+        if nid is None:
+            nid = scoped_index[key] = len(G.node_name)
+            G.node_name.append(row_name[i]); G.node_file.append(row_file[i])
+            G.node_root.append(roots[i]); G.parent.append(-1)
+            G.node_pname.append(row_parent[i])
+        node_of_row.append(nid)
+    G.n = n = len(G.node_name)
+
+    # parents (within scope)
+    for i in range(nrows):
+        pidx = link[i]
+        if pidx >= 0 and roots[pidx] == roots[i]:
+            G.parent[node_of_row[i]] = node_of_row[pidx]
+
+    # direct sources (within scope only; raw by name for the name-keyed tools)
+    src = array("i"); dst = array("i")
+    for i, s in zip(*src_pairs):
+        cand = scoped_index.get((roots[i], row_file[i], s))
+        if cand is not None:
+            src.append(node_of_row[i]); dst.append(cand)
+    G.sources = CSR.from_pairs(n, src, dst)
+    G.raw_sources = CSR.from_pairs(n, array("i", (node_of_row[i] for i in src_pairs[0])), src_pairs[1])
+
+    # dd/assign per node (+ inverted dd -> nodes and dd -> assigns on those nodes)
+    G.from_dd = CSR.from_pairs(n, array("i", (node_of_row[i] for i in dd_pairs[0])), dd_pairs[1])
+    G.assign  = CSR.from_pairs(n, array("i", (node_of_row[i] for i in at_pairs[0])), at_pairs[1])
+    G.dd_nodes = G.from_dd.reverse(len(G.dds))
+    dsrc = array("i"); dat = array("i")
+    for d in range(len(G.dds)):
+        for x in G.dd_nodes.row(d):
+            for a in G.assign.row(x):
+                dsrc.append(d); dat.append(a)
+    G.dd_assigns = CSR.from_pairs(len(G.dds), dsrc, dat)
+    G.name_nodes = CSR.from_pairs(len(names), G.node_name, array("i", range(n)))
+
+    # reverse adjacency for downstream walks
+    kids = array("i", (x for x in range(n) if G.parent[x] >= 0))
+    G.children = CSR.from_pairs(n, array("i", (G.parent[x] for x in kids)), kids)
+    G.consumers = G.sources.reverse(n)
+    G.assign_nodes = G.assign.reverse(len(G.assigns))
+
+    # SELECT handle -> ASSIGN ddname
+    hs = array("i"); ks = array("i")
+    for handle, ddname in selects:
+        d = G.dds.get(handle)
+        if d >= 0 and ddname:
+            hs.append(d); ks.append(G.ddnames.intern(ddname))
+    G.dd_ddnames = CSR.from_pairs(len(G.dds), hs, ks)
+    G.ddname_dds = G.dd_ddnames.reverse(len(G.ddnames))
+    return G
+
+
+# ---------------- binary index file ----------------
+# Layout: MAGIC | u32 header length | JSON header | 8-byte aligned sections.
+# The header lists every section as [offset, nbytes, typecode]; open_index() mmaps the
+# file and exposes each section as a zero-copy memoryview, so opening costs only the
+# header parse and pages are read on first touch.
+INDEX_MAGIC   = b"LINGRAPH"
+INDEX_VERSION = 4
+
+_TABLES = ("names", "files", "dds", "assigns", "ddnames")
+_ARRAYS = ("node_name", "node_file", "node_root", "parent", "node_pname")
+_CSRS   = ("sources", "raw_sources", "from_dd", "assign", "dd_nodes", "dd_assigns", "name_nodes",
+           "children", "consumers", "assign_nodes", "dd_ddnames", "ddname_dds")
+
+
+def write_index(G, path):
+    sections = []   # (name, typecode, bytes)
+    for t in _TABLES:
+        names = getattr(G, t).names
+        enc = [x.encode("utf-8") for x in names]
+        offs = array("q", [0])
+        for b in enc:
+            offs.append(offs[-1] + len(b))
+        order = array("i", sorted(range(len(enc)), key=enc.__getitem__))
+        sections += [(t + ".blob", "B", b"".join(enc)),
+                     (t + ".offs", "q", offs.tobytes()),
+                     (t + ".order", "i", order.tobytes())]
+    for a in _ARRAYS:
+        sections.append((a, "i", getattr(G, a).tobytes()))
+    for c in _CSRS:
+        csr = getattr(G, c)
+        sections += [(c + ".offsets", "i", csr.offsets.tobytes()),
+                     (c + ".targets", "i", csr.targets.tobytes())]
+
+    table = {}
+    pos = 0
+    for name, tc, data in sections:
+        table[name] = [pos, len(data), tc]
+        pos += (len(data) + 7) & ~7
+    header = json.dumps({"version": INDEX_VERSION, "byteorder": sys.byteorder,
+                         "n": G.n, "sections": table}).encode("utf-8")
+    start = (len(INDEX_MAGIC) + 4 + len(header) + 7) & ~7
+
+    tmp = path + ".tmp"
+    with io.open(tmp, "wb") as f:
+        f.write(INDEX_MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        f.write(b"\0" * (start - f.tell()))
+        for name, tc, data in sections:
+            f.write(data)
+            f.write(b"\0" * (((len(data) + 7) & ~7) - len(data)))
+    os.replace(tmp, path)
+
+
+def open_index(path):
+    """mmap a write_index() file as a ScopedGraph; raises ValueError on a foreign/old file."""
+    with io.open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError(f"{path}: not a lineage index")
+    hlen = int.from_bytes(mm[len(INDEX_MAGIC):len(INDEX_MAGIC) + 4], "little")
+    hstart = len(INDEX_MAGIC) + 4
+    header = json.loads(mm[hstart:hstart + hlen].decode("utf-8"))
+    if header.get("version") != INDEX_VERSION or header.get("byteorder") != sys.byteorder:
+        raise ValueError(f"{path}: unsupported index version/byte order")
+    start = (hstart + hlen + 7) & ~7
+    mv = memoryview(mm)
+
+    def sec(name):
+        off, nbytes, tc = header["sections"][name]
+        view = mv[start + off:start + off + nbytes]
+        return view if tc == "B" else view.cast(tc)
+
+    G = ScopedGraph()
+    G._mm = mm
+    G.n = header["n"]
+    for t in _TABLES:
+        setattr(G, t, StringTable(sec(t + ".blob"), sec(t + ".offs"), sec(t + ".order")))
+    for a in _ARRAYS:
+        setattr(G, a, sec(a))
+    for c in _CSRS:
+        setattr(G, c, CSR(sec(c + ".offsets"), sec(c + ".targets")))
+    return G
+
+
+def index_is_fresh(index_path, csv_path):
+    """True when the index exists and is not older than the CSV it was exported with."""
+    if not os.path.exists(index_path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(index_path) >= os.path.getmtime(csv_path)
+
+
+# ---------------- name-keyed view (Trace / Cobol7 / COBOL 12) ----------------
+def iter_rows(G):
+    """Yield (name, origin_file, parent_name, dds, assigns, raw_sources) per var node."""
+    names, dds, ats = G.names, G.dds, G.assigns
+    for x in range(G.n):
+        p = G.node_pname[x]
+        yield (names[G.node_name[x]], G.files[G.node_file[x]], names[p] if p >= 0 else "",
+               [dds[d] for d in G.from_dd.row(x)], [ats[a] for a in G.assign.row(x)],
+               [names[s] for s in G.raw_sources.row(x)])
+
+
+class NameMap(Mapping):
+    """Read-only name -> fn(first node with that name), computed on access."""
+    __slots__ = ("G", "fn")
+
+    def __init__(self, G, fn):
+        self.G, self.fn = G, fn
+
+    def __getitem__(self, name):
+        for x in self.G.nodes_named(name):
+            return self.fn(x)
+        raise KeyError(name)
+
+    def __iter__(self):
+        nn = self.G.name_nodes
+        for i in range(len(nn)):
+            if nn.degree(i):
+                yield self.G.names[i]
+
+    def __len__(self):
+        nn = self.G.name_nodes
+        return sum(1 for i in range(len(nn)) if nn.degree(i))
+
+
+def name_view(G):
+    """Name-keyed mappings over G: rows, parents, sources, origins, dds, assigns."""
+    names, dds, ats = G.names, G.dds, G.assigns
+    return {
+        "rows":    NameMap(G, lambda x: x),
+        "parents": NameMap(G, lambda x: names[G.node_pname[x]] if G.node_pname[x] >= 0 else ""),
+        "sources": NameMap(G, lambda x: {names[s] for s in G.raw_sources.row(x)}),
+        "origins": NameMap(G, lambda x: G.files[G.node_file[x]]),
+        "dds":     NameMap(G, lambda x: {dds[d] for d in G.from_dd.row(x)}),
+        "assigns": NameMap(G, lambda x: {ats[a] for a in G.assign.row(x)}),
+    }
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lineageserver.py — long-running lineage query daemon over the scoped graph
+- Loads lineage.idx (or variables.csv) and the PROC/JCL lookups once, same files as backtrace6.py
+- Local HTTP/JSON API (loopback by default):
+    GET /trace?var=NAME            -> enhanced backtrace rows (as in enhanced_backtrace.csv)
+    GET /origins?var=NAME          -> distinct final DD/ASSIGN keys + producer info
+    GET /paths?var=NAME&limit=N    -> ranked leaf paths as node labels
+    GET /impact?var=SPEC&depth=D&fanout=F&limit=N
+                                   -> downstream nodes (SPEC: NAME | DD:x | ASSIGN:x | DSN:x)
+  limit / depth / fanout must be positive and are capped at MAX_PATHS_LIMIT,
+  IMPACT_LIMIT, IMPACT_MAX_DEPTH, IMPACT_MAX_FANOUT (so answers and LRU keys stay bounded)
+    GET /stats                     -> graph size, cache hits/misses, reload count
+- Answers are kept in an LRU; the graph is reloaded (and the LRU dropped) when
+  lineage.idx / variables.csv / procs_index.csv / jcl_index.csv change on disk
+No CLI; edit paths below (run from the folder that holds variables.csv).
+"""
+
+import os, json, time, threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import backtrace6 as bt
+
+# ---------------- configuration ----------------
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 4096                   # answers kept in the LRU
+RELOAD_POLL = 2.0                   # seconds between on-disk change checks
+MAX_PATHS_LIMIT = 1000              # most leaf paths one /paths answer may ask for
+IMPACT_LIMIT = 10000                # default and maximum nodes per /impact answer
+IMPACT_MAX_DEPTH = bt.IMPACT_MAX_DEPTH or 50        # maximum /impact depth
+IMPACT_MAX_FANOUT = bt.IMPACT_MAX_FANOUT or 5000    # maximum /impact fanout
+WATCHED = (bt.LINEAGE_INDEX, bt.CSV_VARS, bt.CSV_PROCS, bt.CSV_JCL)
+
+# ---------------- service ----------------
+def clamp(value, maximum):
+    """value capped at maximum; 0 / negative ("no limit" in backtrace6) becomes maximum."""
+    return maximum if value <= 0 else min(value, maximum)
+
+def files_signature(paths=WATCHED):
+    sig = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            sig.append((st.st_size, st.st_mtime_ns))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+class LineageService:
+    """Graph + lookups + LRU of answers; queries are safe to call from many threads."""
+
+    def __init__(self, cache_size=CACHE_SIZE, reload_poll=RELOAD_POLL):
+        self.cache_size = cache_size
+        self.reload_poll = reload_poll
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.hits = self.misses = self.reloads = 0
+        self.state = None                       # (G, lookups)
+        self.sig = None
+        self.checked = 0.0
+        self.reload()
+
+    def reload(self):
+        sig = files_signature()
+        G = bt.load_graph()
+        procs = bt.load_csv_rows(bt.CSV_PROCS)
+        jcls  = bt.load_csv_rows(bt.CSV_JCL)
+        state = (G, bt.build_lookups(procs, jcls))
+        with self.lock:
+            self.state, self.sig = state, sig
+            self.cache.clear()
+            self.reloads += 1
+        bt.sorted_neighbors.cache_clear()       # keyed on the old graph object
+        bt.node_rank.cache_clear()
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self.checked < self.reload_poll:
+            return
+        self.checked = now
+        if not self.reload_lock.acquire(blocking=False):
+            return                              # another request is already reloading
+        try:
+            if files_signature() != self.sig:
+                self.reload()
+        finally:
+            self.reload_lock.release()
+
+    def _cached(self, key, compute):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            self.misses += 1
+            state = self.state
+        val = compute(state)
+        with self.lock:
+            if state is self.state:
+                self.cache[key] = val
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return val
+
+    @staticmethod
+    def _starts(G, var):
+        return list(G.nodes_named(bt.tok_only(var))) if G is not None else []
+
+    def trace(self, var):
+        """Enhanced backtrace rows for var (None if unknown)."""
+        def compute(state):
+            G, lookups = state
+            starts = self._starts(G, var)
+            if not starts: return None
+            return bt.backtrace_rows(G, starts, lookups)
+        return self._cached(("trace", bt.tok_only(var)), compute)
+
+    def origins(self, var):
+        """Distinct (key type, key) the variable resolves to, with producer/input info."""
+        rows = self.trace(var)
+        if rows is None: return None
+        out = OrderedDict()
+        for r in rows:
+            k = (r["final_key_type"], r["final_key"])
+            if k not in out:
+                out[k] = {c: r[c] for c in ("final_key_type", "final_key", "producer_file",
+                                            "producer_step", "producer_exec", "input_files",
+                                            "sas_member", "cobol_file_hint")}
+        return list(out.values())
+
+    def paths(self, var, limit=bt.MAX_PATHS_PER_VAR):
+        """Ranked leaf paths (best first) as node labels; limit capped at MAX_PATHS_LIMIT."""
+        limit = clamp(limit, MAX_PATHS_LIMIT)
+        def compute(state):
+            G = state[0]
+            starts = self._starts(G, var)
+            if not starts: return None
+            return [[G.label(n) for n in p] for p in bt.all_leaf_paths_ranked(G, starts, cap=limit)]
+        return self._cached(("paths", bt.tok_only(var), limit), compute)
+
+    def impact(self, spec, depth=IMPACT_MAX_DEPTH, fanout=IMPACT_MAX_FANOUT, limit=IMPACT_LIMIT):
+        """Downstream nodes of spec (breadth-first, as IMPACT_FIELDS dicts); None if unknown.
+        depth / fanout / limit are capped at IMPACT_MAX_DEPTH / IMPACT_MAX_FANOUT / IMPACT_LIMIT."""
+        depth, fanout = clamp(depth, IMPACT_MAX_DEPTH), clamp(fanout, IMPACT_MAX_FANOUT)
+        limit = clamp(limit, IMPACT_LIMIT)
+        def compute(state):
+            G, lookups = state
+            if G is None or not bt.impact_starts(G, spec, lookups): return None
+            return list(bt.impact_rows(G, spec, lookups, max_depth=depth, max_fanout=fanout, limit=limit))
+        return self._cached(("impact", spec.strip().upper(), depth, fanout, limit), compute)
+
+    def stats(self):
+        G = self.state[0]
+        with self.lock:
+            return {"nodes": G.n if G is not None else 0, "cached": len(self.cache),
+                    "hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+# ---------------- HTTP ----------------
+def query_int(q, key, default, maximum):
+    """Positive integer query parameter, capped at maximum; ValueError otherwise."""
+    try:
+        v = int(q.get(key, default))
+    except ValueError:
+        v = 0
+    if v <= 0:
+        raise ValueError(f"{key} must be a positive integer")
+    return min(v, maximum)
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = "HTTP/1.1"           # keep-alive for repeated local queries
+    disable_nagle_algorithm = True          # headers and body are separate writes
+
+    def _send(self, code, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        svc = self.service
+        svc.maybe_reload()
+        u = urlsplit(self.path)
+        q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        op = u.path.strip("/")
+        if op == "stats":
+            return self._send(200, svc.stats())
+        var = q.get("var", "")
+        if op not in ("trace", "origins", "paths", "impact"):
+            return self._send(404, {"error": f"unknown endpoint /{op}"})
+        if not var:
+            return self._send(400, {"error": "missing ?var="})
+        try:
+            if op == "paths":
+                args = (query_int(q, "limit", bt.MAX_PATHS_PER_VAR, MAX_PATHS_LIMIT),)
+            elif op == "impact":
+                args = (query_int(q, "depth", IMPACT_MAX_DEPTH, IMPACT_MAX_DEPTH),
+                        query_int(q, "fanout", IMPACT_MAX_FANOUT, IMPACT_MAX_FANOUT),
+                        query_int(q, "limit", IMPACT_LIMIT, IMPACT_LIMIT))
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        if op in ("paths", "impact"):
+            res = getattr(svc, op)(var, *args)
+        else:
+            res = getattr(svc, op)(var)
+        if res is None:
+            return self._send(404, {"error": f"variable not found: {var}"})
+        self._send(200, {"var": var if op == "impact" else bt.tok_only(var), op: res})
+
+    def log_message(self, fmt, *args):
+        pass
+
+def serve(host=HOST, port=PORT, service=None):
+    Handler.service = service or LineageService()
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    print(f"lineage server on http://{host}:{port} ({Handler.service.stats()['nodes']} nodes)")
+    return httpd
+
+# ---------------- loopback latency check ----------------
+def loopback_latency(names, host=HOST, port=PORT, op="trace", rounds=3):
+    """Query each name `rounds` times over one keep-alive connection; (p50, p99) in ms."""
+    from http.client import HTTPConnection
+    from urllib.parse import quote
+    conn = HTTPConnection(host, port)
+    lat = []
+    for _ in range(rounds):
+        for nm in names:
+            t0 = time.perf_counter()
+            conn.request("GET", f"/{op}?var={quote(nm)}")
+            conn.getresponse().read()
+            lat.append((time.perf_counter() - t0) * 1000.0)
+    conn.close()
+    lat.sort()
+    return lat[len(lat) // 2], lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+
+# ---------------- main ----------------
+def main():
+    httpd = serve()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lineagewatch.py — keep variables.csv, lineage.idx and the PROC/JCL/SAS indexes live
+- Loads every COBOL shard (from ./.cobolindex when current) and every PROC/JCL/SAS
+  member's rows once, then watches ./cobol ./proc ./jcl ./sas ./copybook
+  (inotify through ctypes on Linux, stat polling elsewhere or when USE_INOTIFY = False).
+- Bursts of saves are debounced (DEBOUNCE quiet seconds, at most MAX_DELAY late).
+- Only the changed members are re-read: a COBOL file's shard is replaced (so the old
+  version's vars/edges disappear with it), deleted files drop their shard, a changed
+  copybook rescans the files that COPY it (directly or through nested COPYs).
+- The merged Store is NOT patched in place: it is re-merged from the in-memory shards
+  in path order and DD propagation rerun over the whole estate, because origin_file,
+  record_to_dd and dd_assign follow first-/last-wins rules in file order and a DD
+  binding fans out through every program sharing it. Only the affected outputs are
+  rewritten (atomically), giving the same bytes as a cold cobolindexer/buildindex run.
+  Cost per COBOL save is therefore O(estate), not O(file): on the medium gencorpus
+  preset (2000 programs, ~204k variables) rescan 0.01s, merge 1.1s, propagate 1.7s,
+  variables.csv + lineage.idx rewrite 9.3s. The rewrite dominates and would remain
+  with an in-place patch, since both files are whole-estate exports.
+- check_convergence() mutates a generated corpus step by step and compares every output
+  with a cold build; run it after changing the indexer.
+No CLI; edit the configuration below.
+"""
+
+import os, io, sys, csv, time, shutil, select, struct, hashlib, tempfile
+
+import cobolindexer as ci
+import buildindex as bi
+import copybookcache
+
+# ---------------- configuration ----------------
+BASE = os.getcwd()
+DEBOUNCE = 0.5                      # seconds without new events before an update runs
+MAX_DELAY = 5.0                     # ...but never hold changes back longer than this
+POLL_INTERVAL = 1.0                 # polling fallback: seconds between directory scans
+USE_INOTIFY = True                  # False -> always poll
+SELF_CHECK = False                  # True -> run check_convergence() instead of watching
+
+KINDS = {
+    # dir       scanner  extensions    output csv          fields
+    "proc": ("jcl", bi.JCL_EXTS, "procs_index.csv", bi.JCL_FIELDS),
+    "jcl":  ("jcl", bi.JCL_EXTS, "jcl_index.csv",   bi.JCL_FIELDS),
+    "sas":  ("sas", bi.SAS_EXTS, "sas_index.csv",   bi.SAS_FIELDS),
+}
+COBOL_EXTS = (".CBL",".COB",".TXT")
+
+# ---------------- live state ----------------
+class LiveIndex:
+    """In-memory shards/rows of one base folder; apply(paths) patches them and the outputs."""
+
+    def __init__(self, base=BASE, expand_copy=ci.EXPAND_COPY):
+        self.base = base
+        self.cobol_dir = os.path.join(base, "cobol")
+        self.copy_dir = os.path.join(base, "copybook")
+        self.cache_dir = os.path.join(base, ".cobolindex")
+        self.expand_copy = expand_copy
+        self.copybooks = None
+        self.shards = {}            # cobol path -> Store shard
+        self.entries = {}           # cobol path -> manifest entry (size, mtime, sha1, copies)
+        self.members = {k: {} for k in KINDS}   # kind -> member path -> rows
+        self.store = None
+
+    # ---- paths ----
+    def out(self, name):
+        return os.path.join(self.base, name)
+
+    def watch_dirs(self):
+        return [self.cobol_dir, self.copy_dir] + [os.path.join(self.base, k) for k in KINDS]
+
+    def classify(self, path):
+        """-> 'cobol' | 'copybook' | kind | None for files the indexers ignore."""
+        d = os.path.abspath(path); up = d.upper()
+        for name in ["cobol", "copybook"] + list(KINDS):
+            root = os.path.join(os.path.abspath(self.base), name) + os.sep
+            if d.startswith(root):
+                exts = (COBOL_EXTS if name == "cobol" else
+                        copybookcache.COPY_EXTS if name == "copybook" else KINDS[name][1])
+                return name if up.endswith(exts) else None
+        return None
+
+    # ---- loading ----
+    def _load_copybooks(self):
+        self.copybooks = (copybookcache.load(self.copy_dir, os.path.join(self.base, ".copybookcache"))
+                          if self.expand_copy and os.path.isdir(self.copy_dir) else None)
+        ci.COPYBOOKS = self.copybooks
+
+    def _scan_cobol(self, path):
+        data = ci.read_bytes(path)
+        shard = ci.scan_shard(path, data)
+        os.makedirs(os.path.join(self.cache_dir, "shards"), exist_ok=True)
+        ci.save_shard(self.cache_dir, path, shard)
+        shard = ci.Store.from_dict(path, shard.to_dict())   # same form build_store merges
+        st = os.stat(path)
+        copies = {m: self.copybooks.digest(m) for m in shard.copies} if self.copybooks else {}
+        self.shards[path] = shard
+        self.entries[path] = {"size": st.st_size, "mtime": st.st_mtime_ns,
+                              "sha1": hashlib.sha1(data).hexdigest(), "copies": copies}
+
+    def load(self):
+        """Initial state: cached shards where the manifest is current, scans otherwise."""
+        self._load_copybooks()
+        old = ci.load_manifest(self.cache_dir, ci.copybook_key(self.copybooks))
+        for path in ci.list_cobol_files(self.cobol_dir):
+            st = os.stat(path); ent = old.get(path)
+            shard = None
+            if (ent and ent["size"] == st.st_size and ent["mtime"] == st.st_mtime_ns
+                    and ci.copies_current(ent, self.copybooks)):
+                shard = ci.load_shard(self.cache_dir, path)
+            if shard is None:
+                self._scan_cobol(path)
+            else:
+                self.shards[path] = shard; self.entries[path] = ent
+        for kind, (scanner, exts, _, _) in KINDS.items():
+            scan = bi.SCANNERS[scanner]
+            for p in bi.list_members(os.path.join(self.base, kind), exts):
+                self.members[kind][p] = scan(p)
+        self.rebuild()
+        return self
+
+    # ---- updates ----
+    def apply(self, paths):
+        """Patch state for changed/added/removed paths and rewrite affected outputs.
+        Returns {output name: number of members rescanned or dropped}."""
+        touched = {}
+        by = {}
+        for p in paths:
+            c = self.classify(p)
+            if c: by.setdefault(c, set()).add(p)
+        cobol = set(by.get("cobol", ()))
+        if "copybook" in by and self.expand_copy:
+            self._load_copybooks()
+            for path, ent in self.entries.items():
+                if not ci.copies_current(ent, self.copybooks):
+                    cobol.add(path)
+        for path in sorted(cobol):
+            if os.path.isfile(path):
+                self._scan_cobol(path)
+            elif path in self.shards:
+                del self.shards[path]; del self.entries[path]
+                try:
+                    os.remove(ci.shard_path(self.cache_dir, path))
+                except OSError:
+                    pass
+        if cobol:
+            self.rebuild()
+            self.write_store()
+            touched["variables.csv"] = len(cobol)
+        for kind, (scanner, _, out_name, _) in KINDS.items():
+            if kind not in by:
+                continue
+            rows = self.members[kind]
+            for p in by[kind]:
+                if os.path.isfile(p):
+                    rows[p] = bi.SCANNERS[scanner](p)
+                else:
+                    rows.pop(p, None)
+            self.write_members(kind)
+            touched[out_name] = len(by[kind])
+        return touched
+
+    def rebuild(self):
+        """Full re-merge of all shards + propagate_dd (O(estate); see module notes)."""
+        store = ci.Store()
+        for path in sorted(self.shards):
+            store.merge(self.shards[path])
+        ci.propagate_dd(store)
+        self.store = store
+        ci.save_manifest(self.cache_dir, dict(self.entries), ci.copybook_key(self.copybooks))
+
+    # ---- outputs (atomic replace; variables.csv before lineage.idx keeps the idx fresh) ----
+    def write_members(self, kind):
+        _, _, out_name, fields = KINDS[kind]
+        path = self.out(out_name); tmp = path + ".tmp"
+        with io.open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(fields)
+            for p in sorted(self.members[kind]):
+                w.writerows(self.members[kind][p])
+        os.replace(tmp, path)
+
+    def write_all(self):
+        self.write_store()
+        for kind in KINDS:
+            self.write_members(kind)
+
+    def write_store(self):
+        csv_path, idx_path = self.out("variables.csv"), self.out("lineage.idx")
+        ci.write_csv(self.store, csv_path + ".tmp"); os.replace(csv_path + ".tmp", csv_path)
+        ci.write_lineage_index(self.store, idx_path + ".tmp"); os.replace(idx_path + ".tmp", idx_path)
+
+# ---------------- watchers ----------------
+class PollWatcher:
+    """Changed paths by comparing (size, mtime) snapshots of the watched trees."""
+
+    def __init__(self, dirs, interval=POLL_INTERVAL):
+        self.dirs, self.interval = dirs, interval
+        self.snap = self._snapshot()
+
+    def _snapshot(self):
+        out = {}
+        for d in self.dirs:
+            for root, _, names in os.walk(d):
+                for n in names:
+                    p = os.path.join(root, n)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    out[p] = (st.st_size, st.st_mtime_ns)
+        return out
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        new = self._snapshot()
+        old, self.snap = self.snap, new
+        return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+class InotifyWatcher:
+    """Linux inotify through ctypes (no extra packages); new subdirectories are added as seen."""
+    IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x8, 0x40, 0x80
+    IN_CREATE, IN_DELETE, IN_ISDIR, IN_NONBLOCK = 0x100, 0x200, 0x40000000, 0o4000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    HEADER = struct.Struct("iIII")
+
+    def __init__(self, dirs):
+        import ctypes, ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wds = {}
+        for d in dirs:
+            os.makedirs(d, exist_ok=True)
+            for root, _, _ in os.walk(d):
+                self._add(root)
+
+    def _add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd >= 0:
+            self.wds[wd] = path
+
+    def wait(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        try:
+            buf = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        out = set(); i = 0
+        while i + self.HEADER.size <= len(buf):
+            wd, mask, _, n = self.HEADER.unpack_from(buf, i)
+            name = buf[i + self.HEADER.size:i + self.HEADER.size + n].rstrip(b"\0")
+            i += self.HEADER.size + n
+            if wd not in self.wds or not name:
+                continue
+            p = os.path.join(self.wds[wd], os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    for root, _, names in os.walk(p):
+                        self._add(root)
+                        out.update(os.path.join(root, x) for x in names)
+                continue
+            out.add(p)
+        return out
+
+def make_watcher(dirs, use_inotify=USE_INOTIFY):
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(dirs)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling every {POLL_INTERVAL}s")
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+    return PollWatcher(dirs)
+
+# ---------------- driver ----------------
+def watch(base=BASE, use_inotify=USE_INOTIFY, on_update=None):
+    """Run forever: debounce changes, apply them, rewrite outputs, call on_update(live, touched)."""
+    t0 = time.perf_counter()
+    live = LiveIndex(base).load()
+    live.write_all()
+    print(f"Loaded {len(live.shards)} COBOL files, "
+          f"{sum(len(m) for m in live.members.values())} PROC/JCL/SAS members in {time.perf_counter()-t0:.1f}s")
+    watcher = make_watcher(live.watch_dirs(), use_inotify)
+    print(f"Watching {base} ({type(watcher).__name__}); Ctrl+C to stop")
+    pending = set(); first = last = 0.0
+    try:
+        while True:
+            got = watcher.wait(DEBOUNCE)
+            now = time.monotonic()
+            if got:
+                if not pending: first = now
+                pending |= got; last = now
+            if pending and (now - last >= DEBOUNCE or now - first >= MAX_DELAY):
+                t = time.perf_counter()
+                touched = live.apply(pending)
+                pending = set()
+                if touched:
+                    print(f"{time.strftime('%H:%M:%S')} updated {', '.join(f'{k} ({n})' for k, n in touched.items())} "
+                          f"in {time.perf_counter()-t:.2f}s")
+                    if on_update: on_update(live, touched)
+    except KeyboardInterrupt:
+        pass
+
+# ---------------- convergence check ----------------
+def cold_outputs(base, expand_copy=ci.EXPAND_COPY):
+    """Outputs of a cold cobolindexer + buildindex run over base -> {name: bytes}."""
+    out_dir = tempfile.mkdtemp(prefix="cold-")
+    try:
+        copybooks = None
+        copy_dir = os.path.join(base, "copybook")
+        if expand_copy and os.path.isdir(copy_dir):
+            copybooks = copybookcache.CopybookCache(copy_dir, out_dir).refresh()
+        store, _ = ci.build_store(ci.list_cobol_files(os.path.join(base, "cobol")), None, 1, copybooks)
+        ci.write_csv(store, os.path.join(out_dir, "variables.csv"))
+        ci.write_lineage_index(store, os.path.join(out_dir, "lineage.idx"))
+        for kind, (scanner, exts, out_name, fields) in KINDS.items():
+            bi.write_index(scanner, os.path.join(base, kind), exts, os.path.join(out_dir, out_name), fields, 1)
+        names = ["variables.csv", "lineage.idx"] + [k[2] for k in KINDS.values()]
+        return {n: open(os.path.join(out_dir, n), "rb").read() for n in names}
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def live_outputs(live):
+    names = ["variables.csv", "lineage.idx"] + [k[2] for k in KINDS.values()]
+    return {n: open(live.out(n), "rb").read() for n in names}
+
+def check_convergence(base=None, seed=7, size="tiny"):
+    """
+    Mutate a generated corpus step by step (edit, add, delete, copybook change, nested
+    COPY added then its inner member edited, JCL/SAS edits), apply each step to a LiveIndex and compare every output with a cold build.
+    Returns [(step, [differing outputs])]; all lists empty means the live state converged.
+    """
+    import gencorpus
+    own = base is None
+    base = base or tempfile.mkdtemp(prefix="lineagewatch-")
+    try:
+        gencorpus.generate(base, seed, **gencorpus.PRESETS[size])
+        live = LiveIndex(base).load(); live.write_all()
+        cobol = sorted(ci.list_cobol_files(os.path.join(base, "cobol")))
+        cpys = sorted(os.listdir(os.path.join(base, "copybook")))
+        jcls = sorted(os.listdir(os.path.join(base, "jcl")))
+        sas = sorted(os.listdir(os.path.join(base, "sas")))
+
+        def edit(path, fn):
+            with io.open(path, "r", encoding="utf-8") as f: text = f.read()
+            with io.open(path, "w", encoding="utf-8") as f: f.write(fn(text))
+            return path
+
+        def new_program(path):
+            with io.open(path, "w", encoding="utf-8") as f:
+                f.write("       IDENTIFICATION DIVISION.\n       PROGRAM-ID. NEWPGM.\n"
+                        "       ENVIRONMENT DIVISION.\n       FILE-CONTROL.\n"
+                        "           SELECT NEW-IN ASSIGN TO NEWDD1.\n       DATA DIVISION.\n"
+                        "       FILE SECTION.\n       FD  NEW-IN.\n       01  NEW-REC.\n"
+                        "           05  NEW-FLD PIC X(10).\n       WORKING-STORAGE SECTION.\n"
+                        f"           COPY {cpys[0].split('.')[0]}.\n       01  NEW-WS PIC X(10).\n"
+                        "       PROCEDURE DIVISION.\n           MOVE NEW-FLD TO NEW-WS.\n"
+                        "           MOVE NEW-WS TO WS-P0-V1.\n")
+            return path
+
+        def nested_copy():
+            cdir = os.path.join(base, "copybook")
+            with io.open(os.path.join(cdir, "NESTIN.cpy"), "w", encoding="utf-8") as f:
+                f.write("       01  NESTIN-REC.\n           05  NESTIN-B PIC X(4).\n")
+            with io.open(os.path.join(cdir, "NESTOUT.cpy"), "w", encoding="utf-8") as f:
+                f.write("       01  NESTOUT-REC.\n           05  NESTOUT-F PIC X(4).\n"
+                        "           COPY NESTIN.\n")
+            pgm = edit(cobol[3], lambda t: t.replace("       PROCEDURE DIVISION.",
+                                                     "           COPY NESTOUT.\n       PROCEDURE DIVISION.", 1))
+            return [os.path.join(cdir, "NESTIN.cpy"), os.path.join(cdir, "NESTOUT.cpy"), pgm]
+
+        steps = [
+            ("edit program", lambda: [edit(cobol[0], lambda t: t.replace("MOVE ", "MOVE WS-BUF-0 TO WS-P0-V0.\n           MOVE ", 1))]),
+            ("add program", lambda: [new_program(os.path.join(base, "cobol", "NEWPGM.cbl"))]),
+            ("delete program", lambda: [os.remove(cobol[1]) or cobol[1]]),
+            ("edit copybook", lambda: [edit(os.path.join(base, "copybook", cpys[0]),
+                                            lambda t: t + "           05  CPY-ADDED-FLD PIC X(3).\n")]),
+            ("add nested COPY", nested_copy),
+            ("edit nested copybook", lambda: [edit(os.path.join(base, "copybook", "NESTIN.cpy"),
+                                                   lambda t: t.replace("NESTIN-B", "NESTIN-C"))]),
+            ("drop MOVE lines", lambda: [edit(cobol[2], lambda t: "\n".join(l for l in t.splitlines() if "MOVE" not in l) + "\n")]),
+            ("edit jcl + sas", lambda: [edit(os.path.join(base, "jcl", jcls[0]), lambda t: t.replace("DISP=SHR", "DISP=OLD")),
+                                        edit(os.path.join(base, "sas", sas[0]), lambda t: t + "DATA WORK.Z;\n  SET WORK.Y;\nRUN;\n")]),
+            ("delete jcl", lambda: [os.remove(os.path.join(base, "jcl", jcls[1])) or os.path.join(base, "jcl", jcls[1])]),
+        ]
+        results = []
+        for name, mutate in steps:
+            changed = mutate()
+            live.apply(changed)
+            cold = cold_outputs(base)
+            got = live_outputs(live)
+            results.append((name, [n for n in cold if cold[n] != got[n]]))
+        return results
+    finally:
+        if own:
+            shutil.rmtree(base, ignore_errors=True)
+
+def main():
+    if SELF_CHECK:
+        results = check_convergence()
+        for step, diff in results:
+            print(f"{step:<22} {'OK' if not diff else 'DIFFERS: ' + ', '.join(diff)}")
+        return
+    watch(BASE)
+
+if __name__ == "__main__":
+    main()
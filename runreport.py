@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+runreport.py — per-phase timing and counters for the lineage scripts
+- RunReport.phase(name): context manager adding wall + CPU seconds to that phase
+- RunReport.add(name, n): counters (edges, paths explored, heap pushes, cap hits, ...)
+- RunReport.file_time(path, secs): keeps the TOP_FILES slowest files
+- RunReport.write(path): JSON run report (written next to the script's CSVs)
+Scripts hold NULL (every method a no-op) unless their PROFILE constant is True, and
+hot loops count into locals and report once, so a disabled profiler costs ~nothing.
+"""
+
+import io, os, sys, json, time, heapq
+from contextlib import contextmanager, nullcontext
+
+TOP_FILES = 20
+
+class RunReport:
+    enabled = True
+
+    def __init__(self, script, top_files=TOP_FILES):
+        self.script = script
+        self.top_files = top_files
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.t0 = time.perf_counter(); self.c0 = time.process_time()
+        self.phases = {}                        # name -> [wall, cpu, calls]
+        self.counters = {}
+        self.slow = []                          # min-heap of (secs, path)
+        self.info = {}
+
+    @contextmanager
+    def phase(self, name):
+        w0 = time.perf_counter(); c0 = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - w0, time.process_time() - c0)
+
+    def add_time(self, name, wall, cpu=0.0, calls=1):
+        p = self.phases.get(name)
+        if p is None:
+            p = self.phases[name] = [0.0, 0.0, 0]
+        p[0] += wall; p[1] += cpu; p[2] += calls
+
+    def add(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def file_time(self, path, secs):
+        if len(self.slow) < self.top_files:
+            heapq.heappush(self.slow, (secs, path))
+        elif secs > self.slow[0][0]:
+            heapq.heapreplace(self.slow, (secs, path))
+
+    def note(self, **kw):
+        self.info.update(kw)
+
+    def to_dict(self):
+        return {
+            "script": self.script, "started": self.started,
+            "wall_s": round(time.perf_counter() - self.t0, 4),
+            "cpu_s": round(time.process_time() - self.c0, 4),
+            "phases": {k: {"wall_s": round(w, 4), "cpu_s": round(c, 4), "calls": n}
+                       for k, (w, c, n) in self.phases.items()},
+            "counters": self.counters,
+            "slowest_files": [{"path": p, "seconds": round(s, 4)} for s, p in sorted(self.slow, reverse=True)],
+            "info": self.info,
+            "python": sys.version.split()[0], "pid": os.getpid(),
+        }
+
+    def write(self, path):
+        with io.open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+class _NullReport:
+    enabled = False
+    _null = nullcontext()
+
+    def phase(self, name):
+        return self._null
+    def add_time(self, name, wall, cpu=0.0, calls=1): pass
+    def add(self, name, n=1): pass
+    def file_time(self, path, secs): pass
+    def note(self, **kw): pass
+    def write(self, path): return None
+
+NULL = _NullReport()
+
+def start(script, enabled):
+    """RunReport for script when enabled, else the shared no-op NULL."""
+    return RunReport(script) if enabled else NULL
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+worddiff.py — word-level diff shared by the DOCX comparators
+- tokenize(): punctuation-aware words ("co-operate", "don't", "3.5" stay whole; ",", "(" ...
+  are their own tokens); keep_space=True also returns the whitespace, so "".join() gives
+  the text back unchanged
+- diff_tokens(): tokens interned to ints (blockalign.intern_pair), aligned with patience
+  anchors + Myers (blockalign), returned as spans ("eq" | "del" | "ins", i1, i2, j1, j2);
+  a replaced stretch is a "del" span followed by an "ins" span
+- diff_words(): the same on text, spans as (kind, text)
+- render(): join tokens back with natural spacing around punctuation
+bench() compares difflib.ndiff / SequenceMatcher with this on long clauses.
+"""
+
+import re, time, random, difflib
+
+import blockalign
+
+RE_TOKEN = re.compile(r"\w+(?:['’.,\-/]\w+)*|[^\w\s]", re.UNICODE)
+RE_TOKEN_SPACE = re.compile(r"\s+|\w+(?:['’.,\-/]\w+)*|[^\w\s]", re.UNICODE)
+RE_NO_SPACE_BEFORE = re.compile(r"^[,.;:!?%\)\]\}’”]+$")
+RE_NO_SPACE_AFTER = re.compile(r"^[\(\[\{‘“$]$")
+
+# ---------------- tokens ----------------
+def tokenize(s, keep_space=False):
+    """Words (with inner ' - . , / kept: "3,000.50", "and/or") and single punctuation marks."""
+    if not s:
+        return []
+    return (RE_TOKEN_SPACE if keep_space else RE_TOKEN).findall(s)
+
+def render(tokens):
+    """Join tokens with single spaces, none before closing / after opening punctuation."""
+    out = []
+    prev = ""
+    for t in tokens:
+        if out and not RE_NO_SPACE_BEFORE.match(t) and not RE_NO_SPACE_AFTER.match(prev):
+            out.append(" ")
+        out.append(t)
+        prev = t
+    return "".join(out)
+
+# ---------------- diff ----------------
+def diff_tokens(a, b, engine="patience"):
+    """Spans (kind, i1, i2, j1, j2) covering a and b in order; kind is "eq", "del" or "ins"."""
+    out = []
+    for tag, i1, i2, j1, j2 in blockalign.get_opcodes(a, b, engine):
+        if tag == "equal":
+            out.append(("eq", i1, i2, j1, j2))
+            continue
+        if i1 < i2:
+            out.append(("del", i1, i2, j1, j1))
+        if j1 < j2:
+            out.append(("ins", i2, i2, j1, j2))
+    return out
+
+def diff_words(old, new, tokenizer=str.split, join=" ".join):
+    """[(kind, text)] spans between two texts; default tokens are whitespace-separated words."""
+    a, b = tokenizer(old or ""), tokenizer(new or "")
+    return [(kind, join(a[i1:i2] if kind != "ins" else b[j1:j2]))
+            for kind, i1, i2, j1, j2 in diff_tokens(a, b)]
+
+# ---------------- benchmark ----------------
+def synthetic_clause(words=5000, edit_rate=0.03, burst_rate=0.004, seed=1):
+    """A long clause and an edited copy: edit_rate of words replaced / dropped / added,
+    plus burst_rate rewritten stretches of 20-80 words (what makes ndiff crawl)."""
+    rnd = random.Random(seed)
+    vocab = ["the", "party", "shall", "agreement", "of", "to", "and", "in", "any", "such",
+             "provided", "that", "notice", "obligations", "hereunder", "(a)", "Section", "12.3,",
+             "including", "without", "limitation", "Confidential", "Information", "or", "days"]
+    a = [rnd.choice(vocab) if rnd.random() < 0.8 else f"term{rnd.randrange(words)}" for _ in range(words)]
+    b = []
+    skip = 0
+    for w in a:
+        if skip:
+            skip -= 1; continue
+        r = rnd.random()
+        if r < burst_rate:
+            skip = rnd.randint(20, 80)
+            b.extend(rnd.choice(vocab) if rnd.random() < 0.5 else f"new{rnd.randrange(10**6)}" for _ in range(skip))
+            continue
+        if r < burst_rate + edit_rate / 3:
+            continue
+        b.append(f"new{rnd.randrange(10**6)}" if r < burst_rate + 2 * edit_rate / 3 else w)
+        if rnd.random() < edit_rate / 3:
+            b.append(rnd.choice(vocab))
+    return " ".join(a), " ".join(b)
+
+def bench(words=5000, rounds=3):
+    """Seconds per diff of one words-long clause pair: ndiff, SequenceMatcher, diff_words."""
+    old, new = synthetic_clause(words)
+    a, b = old.split(), new.split()
+    cases = [
+        ("difflib.ndiff", lambda: list(difflib.ndiff(a, b))),
+        ("SequenceMatcher", lambda: difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()),
+        ("worddiff", lambda: diff_words(old, new)),
+    ]
+    out = {}
+    for name, fn in cases:
+        best = float("inf")
+        for _ in range(rounds):
+            t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+        out[name] = round(best, 4)
+        print(f"{words} words  {name:<16} {best * 1000:>10.1f} ms")
+    return out
+
+if __name__ == "__main__":
+    bench()